@@ -0,0 +1,351 @@
+"""
+Воспроизводимый бенчмарк кэша узлов: legacy ``Cache`` (HDF5/pickle) против
+``CacheManager`` (parquet/polars).
+
+Каждый сценарий (синтетический выход узла) прогоняется через каждую реализацию
+в отдельном процессе, чтобы пиковый RSS не смешивался между запусками. Для
+каждого случая считаются латентности сохранения/чтения (p50/p95/max),
+пропускная способность (МБ/с по размеру данных в памяти), пиковый RSS и размер
+кэша на диске. Результат пишется в JSON; с ``--baseline`` текущий прогон
+сравнивается с сохранённым, и при регрессии скрипт завершается с кодом 1.
+
+Пример::
+
+    python benchmarks/cache_benchmark.py --out bench.json
+    python benchmarks/cache_benchmark.py --save-baseline benchmarks/baselines/local.json
+    python benchmarks/cache_benchmark.py --baseline benchmarks/baselines/local.json
+
+Запускается из окружения, где доступны зависимости обоих менеджеров
+(``graph.*``, ``h5py``/``tables`` для legacy). Если реализация не импортируется,
+её случаи помечаются как ``skipped`` с причиной, а не роняют весь прогон.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+CODE_DIR = Path(__file__).resolve().parent.parent / "code"
+RESULTS_VERSION = 1
+
+# метрики, по которым ищем регрессии (для всех «меньше — лучше»)
+REGRESSION_METRICS = ("save_p50", "load_p50", "peak_rss_mb", "disk_bytes")
+
+
+def tall_frame(scale: float, rng: np.random.Generator) -> pd.DataFrame:
+    n = int(1_000_000 * scale)
+    return pd.DataFrame(
+        {
+            "id": np.arange(n),
+            "value": rng.normal(size=n),
+            "category": rng.choice(["a", "b", "c", "d"], size=n),
+            "ts": pd.date_range("2020-01-01", periods=n, freq="s"),
+        }
+    )
+
+
+def wide_frame(scale: float, rng: np.random.Generator) -> pd.DataFrame:
+    n = int(20_000 * scale)
+    return pd.DataFrame(
+        rng.normal(size=(n, 500)), columns=[f"feature_{i}" for i in range(500)]
+    )
+
+
+def mixed_object_frame(scale: float, rng: np.random.Generator) -> pd.DataFrame:
+    n = int(200_000 * scale)
+    mixed = np.empty(n, dtype=object)
+    mixed[::3] = "text"
+    mixed[1::3] = 1
+    mixed[2::3] = 2.5
+    return pd.DataFrame(
+        {
+            "id": np.arange(n),
+            "mixed": mixed,
+            "label": rng.choice(["alpha", "beta", None], size=n),
+        }
+    )
+
+
+def geo_frame(scale: float, rng: np.random.Generator) -> pd.DataFrame:
+    n = int(100_000 * scale)
+    x, y = rng.uniform(-180, 180, size=n), rng.uniform(-90, 90, size=n)
+    return pd.DataFrame(
+        {
+            "id": np.arange(n),
+            "geometry": [f"POINT ({a:.6f} {b:.6f})" for a, b in zip(x, y)],
+        }
+    )
+
+
+def small_frame(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    return pd.DataFrame({"k": np.arange(rows), "v": rng.normal(size=rows)})
+
+
+def payload(data: dict, name: str = "output") -> list[dict]:
+    """Выход узла в формате, общем для ``Cache.save_data`` и ``CacheManager.save_node``"""
+    return [{"name": name, "data": data}]
+
+
+SCENARIOS: dict[str, Callable[[float, np.random.Generator], list[dict]]] = {
+    "tall": lambda scale, rng: payload({"df": tall_frame(scale, rng)}),
+    "wide": lambda scale, rng: payload({"df": wide_frame(scale, rng)}),
+    "mixed_object": lambda scale, rng: payload({"df": mixed_object_frame(scale, rng)}),
+    "geo_wkt": lambda scale, rng: payload({"df": geo_frame(scale, rng)}),
+    "many_small": lambda scale, rng: payload(
+        {f"t{i}": small_frame(100, rng) for i in range(max(1, int(500 * scale)))}
+    ),
+    "remote_refs": lambda scale, rng: payload(
+        {
+            "local": tall_frame(scale / 10, rng),
+            **{
+                f"remote{i}": f"file:///remote/dataset/part-{i}.parquet"
+                for i in range(50)
+            },
+        }
+    ),
+}
+
+
+def payload_nbytes(data_list: list[dict]) -> int:
+    return sum(
+        int(data.memory_usage(deep=True).sum())
+        for el in data_list
+        for data in el["data"].values()
+        if isinstance(data, pd.DataFrame)
+    )
+
+
+def dir_size(path: str) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+class LegacyRunner:
+    root = "CACHE/data/nodes"
+
+    def __init__(self):
+        from old_cache_manager import Cache
+
+        self.cache_cls = Cache
+
+    def save(self, node_id: str, data_list: list[dict]):
+        cache = self.cache_cls()
+        cache.save_data({"input": {}, "output": data_list}, node_id, "bench")
+        return cache
+
+    def load(self, cache):
+        return cache.load_data()
+
+
+class CacheManagerRunner:
+    root = "CACHE/CACHE_OPT"
+
+    def __init__(self, lazy_read: bool):
+        from new_cache_manager import CacheManager
+
+        self.cache_cls = CacheManager
+        self.lazy_read = lazy_read
+
+    def save(self, node_id: str, data_list: list[dict]):
+        cache = self.cache_cls()
+        cache.save_node(node_id, "bench", data_list)
+        return cache
+
+    def load(self, cache):
+        return cache.read_data_cache(lazy_read=self.lazy_read)
+
+
+RUNNERS: dict[str, Callable[[], object]] = {
+    "legacy": LegacyRunner,
+    "cache_manager": lambda: CacheManagerRunner(lazy_read=False),
+    "cache_manager_lazy": lambda: CacheManagerRunner(lazy_read=True),
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_case(
+    scenario: str, runner_name: str, scale: float, repeat: int, seed: int
+) -> dict:
+    """Выполняется в дочернем процессе: пиковый RSS относится только к этому случаю"""
+    sys.path.insert(0, str(CODE_DIR))
+    workdir = tempfile.mkdtemp(prefix=f"bench-{scenario}-{runner_name}-")
+    os.chdir(workdir)  # оба менеджера пишут кэш относительно текущей папки
+    try:
+        return measure(scenario, runner_name, scale, repeat, seed)
+    finally:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(
+    scenario: str, runner_name: str, scale: float, repeat: int, seed: int
+) -> dict:
+    try:
+        runner = RUNNERS[runner_name]()
+    except ImportError as err:
+        return {"status": "skipped", "reason": f"{type(err).__name__}: {err}"}
+
+    data_list = SCENARIOS[scenario](scale, np.random.default_rng(seed))
+    nbytes = payload_nbytes(data_list)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    save_times, load_times = [], []
+    try:
+        for i in range(repeat):
+            started = time.perf_counter()
+            cache = runner.save(f"node{i}", data_list)
+            save_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            runner.load(cache)
+            load_times.append(time.perf_counter() - started)
+    except Exception as err:  # случай не должен ронять весь прогон
+        return {
+            "status": "error",
+            "reason": f"{type(err).__name__}: {err}",
+            "traceback": traceback.format_exc(),
+        }
+
+    # ru_maxrss в Linux — в КБ, в macOS — в байтах
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "status": "ok",
+        "payload_bytes": nbytes,
+        "save_p50": percentile(save_times, 50),
+        "save_p95": percentile(save_times, 95),
+        "save_max": max(save_times),
+        "load_p50": percentile(load_times, 50),
+        "load_p95": percentile(load_times, 95),
+        "load_max": max(load_times),
+        "save_mb_s": nbytes / 2**20 / statistics.median(save_times),
+        "load_mb_s": nbytes / 2**20 / statistics.median(load_times),
+        "peak_rss_mb": peak_rss * unit / 2**20,
+        "rss_growth_mb": (peak_rss - rss_before) * unit / 2**20,
+        "disk_bytes": dir_size(runner.root) // repeat,
+    }
+
+
+def run_isolated(*args) -> dict:
+    """Отдельный процесс на случай; падение процесса записывается как ошибка случая"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        try:
+            return pool.submit(run_case, *args).result()
+        except BrokenProcessPool as err:
+            return {"status": "error", "reason": f"worker crashed: {err}"}
+
+
+def environment() -> dict:
+    import pyarrow
+    import polars
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "pyarrow": pyarrow.__version__,
+        "polars": polars.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Список регрессий: метрика выросла больше чем на ``tolerance`` относительно базы"""
+    regressions = []
+    for case, current in results["cases"].items():
+        base = baseline["cases"].get(case)
+        if not base or base.get("status") != "ok":
+            continue
+        if current.get("status") != "ok":
+            regressions.append(
+                f"{case}: {current.get('status')} ({current.get('reason')})"
+            )
+            continue
+        for metric in REGRESSION_METRICS:
+            if base[metric] and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{case}.{metric}: {current[metric]:.4g} vs baseline {base[metric]:.4g}"
+                )
+    return regressions
+
+
+def print_table(results: dict) -> None:
+    header = f"{'case':<36}{'save p50':>10}{'load p50':>10}{'save MB/s':>11}{'rss MB':>9}{'disk MB':>9}"
+    print(header)
+    for case, r in results["cases"].items():
+        if r["status"] != "ok":
+            print(f"{case:<36}{r['status']}: {r['reason'][:100]}")
+            continue
+        print(
+            f"{case:<36}{r['save_p50']:>10.3f}{r['load_p50']:>10.3f}"
+            f"{r['save_mb_s']:>11.1f}{r['peak_rss_mb']:>9.0f}{r['disk_bytes'] / 2**20:>9.1f}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--runners", nargs="+", choices=RUNNERS, default=list(RUNNERS))
+    parser.add_argument(
+        "--scale", type=float, default=0.1, help="множитель размеров данных"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="куда записать результаты (JSON)")
+    parser.add_argument("--save-baseline", help="записать результаты как базовую линию")
+    parser.add_argument("--baseline", help="сравнить с базовой линией")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "created_at": time.time(),
+        "params": {"scale": args.scale, "repeat": args.repeat, "seed": args.seed},
+        "environment": environment(),
+        "cases": {},
+    }
+    for scenario in args.scenarios:
+        for runner_name in args.runners:
+            results["cases"][f"{scenario}/{runner_name}"] = run_isolated(
+                scenario, runner_name, args.scale, args.repeat, args.seed
+            )
+    print_table(results)
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get("params") != results["params"]:
+            print(
+                f"warning: baseline params {baseline.get('params')} differ from current run"
+            )
+        if regressions := compare(results, baseline, args.tolerance):
+            print("Regressions:", *regressions, sep="\n  ")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+Перенос кэша узлов из legacy-раскладки ``Cache`` (HDF5) в ``CacheManager`` (parquet).
+
+Узел ``{legacy_root}/{project}/{node}/output/*.h5`` переписывается в кэш
+``CacheManager`` без пересчёта: каждая таблица читается из HDF5 кусками по
+``chunk_rows`` строк и потоком пишется в parquet (``save_node`` с генератором
+чанков), поэтому память не зависит от размера таблицы. Ключи таблиц и имена
+элементов берутся из имён файлов (``{key}:{name}.h5``), так что после переноса
+``read_data_cache`` возвращает те же ключи, что и ``Cache.load_data``; WKT-колонки
+геоданных преобразуются обратно в геометрию, как при чтении legacy-кэша
+(``convert_wkt_if_geo`` из окружения графа; без неё геометрия остаётся WKT-строками).
+
+Перенос возобновляемый: ``cache_key`` перенесённого узла — ключ от путей, размеров
+и mtime его HDF5-файлов, и узел, для которого ``CacheManager.is_valid`` уже
+верен, пропускается. Прерванный узел не публикует манифест и при повторном
+запуске переносится заново. Узлы обрабатываются параллельно в пуле процессов.
+
+Пример::
+
+    python code/migrate_legacy_cache.py --workers 8 --report migration.json
+    python code/migrate_legacy_cache.py --project 42 --storage-root s3://bucket/ --cache-dir CACHE
+
+Входы узлов (``input/``) не переносятся: ``CacheManager`` хранит только выход
+узла, а входы читаются из кэша вышестоящих узлов. Таблицы не в формате
+``table`` (массивы h5py) тоже пропускаются — их нет в раскладке ``CacheManager``;
+пропущенные файлы перечисляются в отчёте.
+"""
+
+import argparse
+import builtins
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+import old_cache_manager
+from new_cache_manager import CacheManager
+from old_cache_manager import Cache
+
+logger = logging.getLogger("NodeCache")
+
+# строк в одном чанке чтения HDF5
+CHUNK_ROWS = 500_000
+# версия правил переноса: при её изменении узлы переносятся заново
+MIGRATION_VERSION = 1
+
+
+@dataclass
+class NodeMigration:
+    project_id: str
+    node_id: str
+    status: str  # "migrated", "skipped" (уже перенесён) или "failed"
+    tables: int = 0
+    rows: int = 0
+    source_bytes: int = 0
+    seconds: float = 0.0
+    skipped_files: list[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def mb_per_s(self) -> float:
+        if not self.seconds:
+            return 0.0
+        return self.source_bytes / self.seconds / (1 << 20)
+
+
+def legacy_nodes(legacy_root: str, projects: Optional[list[str]] = None) -> list:
+    """``(project_id, node_id)`` всех узлов legacy-кэша, у которых есть выход"""
+    nodes = []
+    for output_path in sorted(glob.glob(f"{legacy_root}/*/*/output")):
+        project_id, node_id = output_path.split("/")[-3:-1]
+        if projects is None or project_id in projects:
+            nodes.append((project_id, node_id))
+    return nodes
+
+
+def legacy_tables(
+    node_path: str, legacy: Optional[Cache] = None
+) -> list[tuple[str, str, str]]:
+    """
+    Таблицы выхода legacy-узла: ``(name, df_key, path)``.
+
+    Если есть сам объект ``Cache`` узла, имена элементов и ссылки на удалённые данные
+    берутся из его метаданных. Иначе они восстанавливаются по именам файлов:
+    ``Cache.save_data_list_to_hd`` дописывает к ключу ``:{name}``, если ключ ещё не
+    оканчивается именем элемента; в этом случае именем считается весь ключ.
+    """
+    if legacy is not None:
+        return [
+            (el["name"], df_key, path)
+            for el in legacy.data["output"]
+            for df_key, path in el["data"].items()
+        ]
+    tables = []
+    for path in sorted(glob.glob(f"{node_path}/output/*.h5")):
+        df_key = os.path.basename(path)[: -len(".h5")]
+        tables.append((df_key.rsplit(":", 1)[-1], df_key, path))
+    return tables
+
+
+def source_key(tables: list[tuple[str, str, str]]) -> str:
+    """cache_key перенесённого узла: меняется вместе с любым из исходных файлов"""
+    files = []
+    for _, df_key, path in tables:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            files.append((df_key, stat.st_size, stat.st_mtime_ns))
+        else:  # ссылка на удалённые данные
+            files.append((df_key, path))
+    return CacheManager.make_cache_key("legacy-hdf5", MIGRATION_VERSION, files)
+
+
+def table_storer_key(path: str) -> Optional[str]:
+    """Ключ DataFrame в формате ``table`` внутри файла или None, если читать по частям нечего"""
+    try:
+        with pd.HDFStore(path, "r") as store:
+            for key in store.keys():
+                if store.get_storer(key).is_table:
+                    return key
+    except (OSError, ValueError, TypeError):  # файл h5py без pandas-структуры
+        pass
+    return None
+
+
+def read_chunks(path: str, key: str, chunk_rows: int) -> Iterator:
+    """Читает таблицу HDF5 кусками; файл открыт, пока генератор не исчерпан"""
+    with pd.HDFStore(path, "r") as store:
+        for chunk in store.select(key, chunksize=chunk_rows):
+            yield restore_geo(chunk)
+
+
+def legacy_geo_converter() -> Optional[Callable]:
+    """
+    ``convert_wkt_if_geo``, которым ``H5pyStorageFileHandler.load`` восстанавливает геоданные.
+    В old_cache_manager это свободное имя из окружения графа (функция там не определена
+    и не импортируется), поэтому ищем её так же, как интерпретатор: в глобальных
+    именах модуля, затем в builtins.
+    """
+    return vars(old_cache_manager).get("convert_wkt_if_geo") or getattr(
+        builtins, "convert_wkt_if_geo", None
+    )
+
+
+def restore_geo(chunk: pd.DataFrame):
+    """
+    WKT-колонки обратно в геометрию, как ``H5pyStorageFileHandler.load``. Геоданные
+    отдаются Arrow-таблицей с геометрией в WKB — так же их пишет GeoParquet.
+    """
+    if (convert := legacy_geo_converter()) is not None:
+        chunk = convert(chunk)
+    if hasattr(chunk, "geometry") and hasattr(chunk, "to_arrow"):  # GeoDataFrame
+        return pa.table(chunk.to_arrow(index=False))
+    return chunk
+
+
+def migrate_node(
+    project_id: str,
+    node_id: str,
+    legacy_root: str = Cache.CACHE_ROOT,
+    chunk_rows: int = CHUNK_ROWS,
+    force: bool = False,
+    legacy: Optional[Cache] = None,
+    **cache_kwargs,
+) -> NodeMigration:
+    """
+    Переносит один узел. Ошибки не поднимаются, а попадают в ``NodeMigration.error``,
+    чтобы один битый файл не останавливал перенос остальных узлов.
+
+    :param force: переносить заново, даже если узел уже перенесён из тех же файлов.
+    :param legacy: объект ``Cache`` узла (из состояния графа), если он сохранился —
+        тогда переносятся и ссылки на удалённые данные.
+    :param cache_kwargs: параметры конструктора CacheManager.
+    """
+    started = time.perf_counter()
+    result = NodeMigration(project_id, node_id, "migrated")
+    try:
+        tables = legacy_tables(f"{legacy_root}/{project_id}/{node_id}", legacy)
+        remote_keys = set(legacy._remote_keys) if legacy is not None else set()
+        cache_key = source_key(tables)
+        if not force and CacheManager.is_valid(
+            project_id, node_id, cache_key, **cache_kwargs
+        ):
+            result.status = "skipped"
+            return result
+
+        elements: dict[str, dict] = {}
+        for name, df_key, path in tables:
+            element = elements.setdefault(name, {"name": name, "data": {}})
+            if df_key in remote_keys:
+                element["data"][df_key] = path
+                continue
+            key = table_storer_key(path)
+            if key is None:
+                result.skipped_files.append(path)
+                continue
+            result.source_bytes += os.path.getsize(path)
+            element["data"][df_key] = read_chunks(path, key, chunk_rows)
+
+        cache = CacheManager(**cache_kwargs)
+        cache.save_node(
+            node_id, project_id, list(elements.values()), cache_key=cache_key
+        )
+        result.tables = len(cache.artifacts)
+        result.rows = sum(info["num_rows"] for info in cache.artifacts.values())
+    except Exception as err:
+        result.status = "failed"
+        result.error = repr(err)
+        logger.exception(
+            "Failed to migrate node %s in project_id %s", node_id, project_id
+        )
+    finally:
+        result.seconds = time.perf_counter() - started
+    return result
+
+
+def migrate_cache(
+    legacy_root: str = Cache.CACHE_ROOT,
+    workers: int = 1,
+    projects: Optional[list[str]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    force: bool = False,
+    progress: Optional[Callable[[NodeMigration, int, int], None]] = None,
+    **cache_kwargs,
+) -> list[NodeMigration]:
+    """
+    Переносит все узлы legacy-кэша (или узлы ``projects``) в пуле из ``workers`` процессов.
+
+    ``progress(result, done, total)`` вызывается после каждого узла.
+    """
+    nodes = legacy_nodes(legacy_root, projects)
+    if legacy_geo_converter() is None:
+        logger.warning(
+            "convert_wkt_if_geo is not available: geometry columns are migrated as WKT strings"
+        )
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(
+                migrate_node,
+                project_id,
+                node_id,
+                legacy_root,
+                chunk_rows,
+                force,
+                None,
+                **cache_kwargs,
+            )
+            for project_id, node_id in nodes
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+            if progress is not None:
+                progress(results[-1], len(results), len(nodes))
+    return results
+
+
+def summarize(results: list[NodeMigration], seconds: float) -> dict:
+    migrated = [r for r in results if r.status == "migrated"]
+    source_bytes = sum(r.source_bytes for r in migrated)
+    return {
+        "nodes": len(results),
+        "migrated": len(migrated),
+        "skipped": sum(r.status == "skipped" for r in results),
+        "failed": sum(r.status == "failed" for r in results),
+        "rows": sum(r.rows for r in migrated),
+        "source_bytes": source_bytes,
+        "seconds": seconds,
+        "mb_per_s": source_bytes / seconds / (1 << 20) if seconds else 0.0,
+    }
+
+
+def log_progress(result: NodeMigration, done: int, total: int) -> None:
+    logger.info(
+        "[%d/%d] %s/%s %s: %d tables, %d rows, %.1f MB/s%s",
+        done,
+        total,
+        result.project_id,
+        result.node_id,
+        result.status,
+        result.tables,
+        result.rows,
+        result.mb_per_s,
+        f" ({result.error})" if result.error else "",
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--legacy-root", default=Cache.CACHE_ROOT)
+    parser.add_argument("--storage-root", default="")
+    parser.add_argument("--cache-dir", default="CACHE_test")
+    parser.add_argument("--nodes-dir", default="nodes")
+    parser.add_argument("--project", action="append", dest="projects")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument(
+        "--force", action="store_true", help="переносить и уже перенесённые узлы"
+    )
+    parser.add_argument("--report", help="JSON-отчёт по узлам и итогам")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    started = time.perf_counter()
+    results = migrate_cache(
+        args.legacy_root,
+        workers=args.workers,
+        projects=args.projects,
+        chunk_rows=args.chunk_rows,
+        force=args.force,
+        progress=log_progress,
+        storage_root=args.storage_root,
+        cache_dir=args.cache_dir,
+        nodes_dir=args.nodes_dir,
+    )
+    summary = summarize(results, time.perf_counter() - started)
+    logger.info(
+        "Migrated %d of %d nodes (%d skipped, %d failed), %d rows, %.1f MB/s",
+        summary["migrated"],
+        summary["nodes"],
+        summary["skipped"],
+        summary["failed"],
+        summary["rows"],
+        summary["mb_per_s"],
+    )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(
+                {"summary": summary, "nodes": [asdict(r) for r in results]},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
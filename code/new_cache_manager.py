@@ -1,23 +1,693 @@
+import asyncio
+import functools
+import glob
+import hashlib
+import io
+import itertools
+import json
+import math
 import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext, suppress
 from pathlib import Path
 import pickle
-from typing import Optional
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Optional
+from urllib.parse import quote, unquote
 import pandas as pd
 import logging
 import shutil
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 from polars.dataframe.frame import DataFrame as pl_DataFrame
-from polars.exceptions import ColumnNotFoundError
-from pyarrow.lib import ArrowInvalid
 import warnings
+from dataclasses import asdict, dataclass, replace
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка узла через lease-файл
+    fcntl = None
 
 from graph.core.patameters.tools import hash_columns_list
 
 logger = logging.getLogger("NodeCache")
 
+BROKEN_CACHE_MESSAGE = (
+    "Вы поймали самую редкую ошибку в SMILE, Поздравляю вас. Этот граф скорее всего сломан, "
+    "либо перезагрузите граф, либо создайте новый. Мы уже работаем над этим, простите за неудобства!"
+)
+
+# polars.DataFrame в выходе узла — данные только для просмотра, в кэш они не пишутся
+INCOMPLETE_DATA_WARNING = (
+    "Предпринята попытка сохранить неполные данные кэша. "
+    "Пожалуйста, избегайте сохранения неполных экземпляров"
+)
+
+
+# фильтр строк: Polars-выражение или [(col, op, value)], условия объединяются через И
+Filters = pl.Expr | list[tuple[str, str, Any]]
+
+FILTER_OPERATORS: dict[str, Callable[[pl.Expr, Any], pl.Expr]] = {
+    "==": lambda col, value: col == value,
+    "=": lambda col, value: col == value,
+    "!=": lambda col, value: col != value,
+    "<": lambda col, value: col < value,
+    "<=": lambda col, value: col <= value,
+    ">": lambda col, value: col > value,
+    ">=": lambda col, value: col >= value,
+    "in": lambda col, value: col.is_in(list(value)),
+    "not in": lambda col, value: ~col.is_in(list(value)),
+}
+
+
+@dataclass(frozen=True)
+class WritePolicy:
+    """
+    Параметры записи parquet: кодек, уровень сжатия, словарное кодирование,
+    размер row group, статистики и page index. Имя политики сохраняется в метаданных.
+    """
+
+    name: str = "default"
+    compression: Optional[str] = "snappy"
+    compression_level: Optional[int] = None
+    use_dictionary: bool = True
+    row_group_size: Optional[int] = None
+    write_statistics: bool = True
+    write_page_index: bool = False
+
+    def writer_kwargs(self) -> dict:
+        """Параметры для ``pq.ParquetWriter`` / ``df.to_parquet`` (без row_group_size)"""
+        kwargs = asdict(self)
+        kwargs.pop("name")
+        kwargs.pop("row_group_size")
+        return kwargs
+
+
+WRITE_POLICIES: dict[str, WritePolicy] = {
+    "default": WritePolicy(),
+    # минимум CPU на запись: быстрый кодек и крупные row group'ы
+    "fast-write": WritePolicy(
+        name="fast-write", compression="lz4", row_group_size=1_048_576
+    ),
+    # минимум места на диске ценой CPU
+    "small-on-disk": WritePolicy(
+        name="small-on-disk", compression="zstd", compression_level=19
+    ),
+    # мелкие row group'ы и page index — быстрые страницы и фильтры предпросмотра
+    "preview-optimized": WritePolicy(
+        name="preview-optimized", row_group_size=10_000, write_page_index=True
+    ),
+}
+
+
+def resolve_write_policy(policy: str | WritePolicy) -> WritePolicy:
+    if isinstance(policy, WritePolicy):
+        return policy
+    try:
+        return WRITE_POLICIES[policy]
+    except KeyError:
+        raise ValueError(
+            f"Unknown write policy {policy!r}, expected one of {list(WRITE_POLICIES)}"
+        ) from None
+
+
+class CacheArtifactError(RuntimeError):
+    """Ошибка сохранения/чтения одного или нескольких артефактов узла.
+
+    ``errors`` хранит исключение для каждой упавшей таблицы по ключу
+    ``(имя элемента, ключ таблицы)``, чтобы при параллельной обработке было видно,
+    какие именно таблицы не удалось записать или прочитать.
+    """
+
+    def __init__(self, errors: dict[tuple[str, str], BaseException]):
+        self.errors = errors
+        details = "; ".join(
+            f"{name}/{key}: {err!r}" for (name, key), err in errors.items()
+        )
+        super().__init__(f"Failed to process cache artifacts: {details}")
+
+
+class CacheMissError(FileNotFoundError):
+    """Кэша узла больше нет (вытеснен квотой или удалён) — узел нужно пересчитать"""
+
+    def __init__(self, path: str):
+        self.path = path
+        super().__init__(f"Cache node not found: {path}")
+
+
+class UnknownColumnsError(KeyError):
+    """Запрошенных колонок нет в таблице ни под «чистыми», ни под «грязными» именами"""
+
+    def __init__(self, columns: list[str], path: str = ""):
+        self.columns = columns
+        self.path = path
+        super().__init__(f"Columns {columns} not found in cached table {path}")
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+
+class MemoryCacheTier:
+    """
+    Общий для процесса LRU-кэш прочитанных таблиц с ограничением по байтам.
+
+    Ключ включает путь, параметры чтения и ``mtime``/размер файла, поэтому перезаписанный
+    файл никогда не отдаётся из памяти. Закэшированные таблицы разделяются между
+    читателями — возвращаются поверхностные копии, сами данные изменять нельзя.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024**2):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, data) -> None:
+        size = estimate_nbytes(data)
+        if size > self.max_bytes:  # не вытесняем всё ради одной огромной таблицы
+            return
+        with self._lock:
+            if (old := self._entries.pop(key, None)) is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (data, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, path_prefix: str) -> int:
+        """Удаляет все записи для файлов внутри ``path_prefix`` (или для самого файла)"""
+        prefix = str(path_prefix).rstrip("/")
+        with self._lock:
+            stale = [
+                key
+                for key in self._entries
+                if key[0] == prefix or key[0].startswith(prefix + "/")
+            ]
+            for key in stale:
+                self.nbytes -= self._entries.pop(key)[1]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class InMemoryMetrics:
+    """
+    Потокобезопасный агрегатор метрик кэша по (op, mode, project_id, node_id):
+    число операций, секунды, байты и строки. Умеет отдавать текст в формате Prometheus.
+    """
+
+    FIELDS = ("seconds", "nbytes", "rows")
+
+    def __init__(self):
+        self._totals: dict[tuple, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: dict) -> None:
+        labels = tuple(
+            (label, str(event.get(label, "")))
+            for label in ("op", "mode", "project_id", "node_id")
+        )
+        with self._lock:
+            totals = self._totals.setdefault(
+                labels, dict.fromkeys(("count", *self.FIELDS), 0)
+            )
+            totals["count"] += 1
+            for field in self.FIELDS:
+                totals[field] += event.get(field) or 0
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [
+                {**dict(labels), **totals} for labels, totals in self._totals.items()
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+    def to_prometheus(self, prefix: str = "nodecache") -> str:
+        """Text exposition format: по одному counter'у на поле"""
+        names = {
+            "count": "operations_total",
+            "seconds": "seconds_total",
+            "nbytes": "bytes_total",
+            "rows": "rows_total",
+        }
+        snapshot = self.snapshot()
+        lines = []
+        for field, name in names.items():
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for row in snapshot:
+                labels = ",".join(
+                    f'{label}="{escape_label(row[label])}"'
+                    for label in ("op", "mode", "project_id", "node_id")
+                )
+                lines.append(f"{prefix}_{name}{{{labels}}} {row[field]}")
+        return "\n".join(lines) + "\n"
+
+
+class CallbackMetrics:
+    """Передаёт каждое событие метрик в пользовательские функции"""
+
+    def __init__(self, *callbacks: Callable[[dict], None]):
+        self.callbacks = callbacks
+
+    def record(self, event: dict) -> None:
+        for callback in self.callbacks:
+            callback(event)
+
+
+class LocalStorage:
+    """Локальная файловая система: атомарный os.replace и memory map при чтении"""
+
+    is_local = True
+
+    def makedirs(self, path: str) -> None:
+        create_folder(path)
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def signature(self, path: str) -> tuple:
+        """Версия файла: меняется при любой перезаписи"""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def modified(self, path: str) -> float:
+        return os.path.getmtime(path)
+
+    def touch(self, path: str) -> None:
+        Path(path).touch()
+
+    def rename(self, src: str, dst: str) -> None:
+        os.rename(src, dst)
+
+    def read_bytes(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def write_bytes(self, path: str, payload: bytes) -> None:
+        """Пишет файл через временный файл и os.replace — читатели видят либо старую, либо новую версию"""
+        tmp_path = self.temp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def temp_path(self, path: str) -> str:
+        """Локальный временный файл, который потом публикуется через commit"""
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def commit(self, tmp_path: str, path: str) -> None:
+        os.replace(tmp_path, path)
+
+    def rmtree(self, path: str) -> None:
+        shutil.rmtree(path)
+
+    def remove(self, path: str) -> None:
+        os.unlink(path)
+
+    def du(self, path: str) -> int:
+        """Байты файлов под папкой; файл с несколькими hard link'ами (снимки) считается один раз"""
+        seen, total = set(), 0
+        for folder, _, files in os.walk(path):
+            for name in files:
+                with suppress(FileNotFoundError):
+                    stat = os.stat(os.path.join(folder, name))
+                    if (stat.st_dev, stat.st_ino) not in seen:
+                        seen.add((stat.st_dev, stat.st_ino))
+                        total += stat.st_size
+        return total
+
+    def link(self, src: str, dst: str) -> None:
+        """Тот же файл под новым путём: hard link, а между файловыми системами — копия"""
+        tmp_path = self.temp_path(dst)
+        try:
+            os.link(src, tmp_path)
+        except FileNotFoundError:
+            raise
+        except OSError:  # другая файловая система или ФС без hard link'ов
+            shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+
+    @contextmanager
+    def lock(self, path: str, timeout: float, ttl: float):
+        """Эксклюзивная блокировка между процессами и потоками: flock на lock-файле"""
+        if fcntl is None:
+            with hold_lease(self, path, timeout, ttl):
+                yield
+            return
+
+        deadline = time.monotonic() + timeout
+        while True:
+            # папку с lock-файлом могли переименовать (вытеснение узла), пока мы ждали
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, "a+b")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"Cache node is locked: {path}")
+                        time.sleep(0.05)
+                # блокировка взята на файл, который всё ещё лежит по этому пути
+                with suppress(FileNotFoundError):
+                    if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                        break
+                fcntl.flock(f, fcntl.LOCK_UN)
+            except BaseException:
+                f.close()
+                raise
+            f.close()
+
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def glob(self, pattern: str) -> list[str]:
+        return glob.glob(pattern)
+
+    @contextmanager
+    def open_input(self, path: str):
+        """Источник для pyarrow/polars: локальный путь (с поддержкой memory map)"""
+        yield path
+
+
+class LocalReadThroughTier:
+    """
+    Локальный дисковый кэш файлов удалённого хранилища с LRU-вытеснением по байтам.
+
+    Файл скачивается один раз на версию (ETag/mtime + размер), дальше читается
+    с локального диска. Несколько CacheManager (и процессов) с одним ``root``
+    разделяют скачанные файлы: лимит ``max_bytes`` считается по файлам в ``root``
+    под общей блокировкой, а копия, которую сейчас читают, не вытесняется — читатель
+    держит на ней разделяемый flock, вытеснение пропускает файлы, занятые другими.
+    """
+
+    LOCK_NAME = ".lock"
+
+    def __init__(self, root: str, max_bytes: int = 10 * 1024**3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0  # размер копий в root по последнему подсчёту
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._evict()  # файлы, скачанные до перезапуска, могли превысить лимит
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def local_copy(self, storage: "FsspecStorage", path: str) -> Iterator[str]:
+        """
+        Локальный путь к актуальной копии удалённого файла; пока контекст открыт,
+        копия не вытесняется ни этим, ни другими процессами.
+        """
+        name = hashlib.blake2b(
+            repr((path, storage.signature(path))).encode(), digest_size=16
+        ).hexdigest()
+        local_path = os.path.join(self.root, f"{name}.parquet")
+        downloaded = False
+        while True:
+            if not os.path.isfile(local_path):
+                tmp_path = f"{local_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                storage.fs.get_file(path, tmp_path)
+                # копию не заменяем: на её inode уже может стоять flock другого читателя,
+                # и подменённый файл вытеснение удалило бы у него из-под ног
+                try:
+                    os.link(tmp_path, local_path)
+                except FileExistsError:
+                    pass
+                except OSError:  # ФС без hard link'ов
+                    os.replace(tmp_path, local_path)
+                with suppress(FileNotFoundError):
+                    os.unlink(tmp_path)
+                downloaded = True
+            try:
+                f = open(local_path, "rb")
+            except FileNotFoundError:  # копию вытеснили между скачиванием и открытием
+                continue
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_SH)
+            # пока ждали блокировку, копию могли вытеснить или заменить
+            with suppress(FileNotFoundError):
+                if os.stat(local_path).st_ino == os.fstat(f.fileno()).st_ino:
+                    break
+            f.close()
+
+        try:
+            with self._lock:
+                if downloaded:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            # порядок LRU — по mtime, общий для процессов; время ставим явно, с точностью
+            # до наносекунд: штамп ядра грубее интервала между чтениями
+            now = time.time_ns()
+            os.utime(f.fileno(), ns=(now, now))
+            if downloaded:
+                self._evict()
+            yield local_path
+        finally:
+            f.close()  # закрытие снимает flock
+
+    def _evict(self) -> None:
+        """Удаляет давно читанные копии, пока файлы в root не уложатся в max_bytes"""
+        with LocalStorage().lock(
+            os.path.join(self.root, self.LOCK_NAME),
+            CacheManager.LOCK_TIMEOUT,
+            CacheManager.LEASE_TTL,
+        ):
+            entries = []
+            for entry in os.scandir(self.root):
+                if entry.name.endswith(".parquet"):
+                    with suppress(FileNotFoundError):
+                        entries.append(
+                            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                        )
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, local_path in entries:
+                if total <= self.max_bytes:
+                    break
+                if evict_unused(local_path):
+                    total -= size
+            self.nbytes = total
+
+
+def evict_unused(local_path: str) -> bool:
+    """Удаляет файл, если никто не держит на нём flock; False — файл сейчас читают"""
+    try:
+        f = open(local_path, "rb")
+    except FileNotFoundError:
+        return True
+    with f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        try:
+            os.unlink(local_path)
+        except FileNotFoundError:
+            pass
+        except OSError:  # Windows: открытый файл удалить нельзя
+            return False
+    return True
+
+
+class FsspecStorage:
+    """
+    Объектное или удалённое хранилище через fsspec (s3://, gs://, memory:// ...).
+
+    Запись идёт в локальный временный файл и публикуется одной загрузкой объекта,
+    поэтому читатели не видят частично записанных файлов. При наличии ``read_tier``
+    чтения обслуживаются из локальной дисковой копии.
+    """
+
+    is_local = False
+
+    def __init__(
+        self,
+        url: str,
+        storage_options: Optional[dict] = None,
+        read_tier: Optional[LocalReadThroughTier] = None,
+    ):
+        import fsspec
+
+        self.fs, _ = fsspec.core.url_to_fs(url, **(storage_options or {}))
+        self.read_tier = read_tier
+
+    def makedirs(self, path: str) -> None:
+        self.fs.makedirs(path, exist_ok=True)
+
+    def isdir(self, path: str) -> bool:
+        return self.fs.isdir(path)
+
+    def signature(self, path: str) -> tuple:
+        info = self.fs.info(path)
+        version = next(
+            (
+                info[field]
+                for field in ("ETag", "etag", "mtime", "LastModified", "created")
+                if info.get(field) is not None
+            ),
+            None,
+        )
+        return str(version), info["size"]
+
+    def modified(self, path: str) -> float:
+        return self.fs.modified(path).timestamp()
+
+    def touch(self, path: str) -> None:
+        self.fs.touch(path)
+
+    def rename(self, src: str, dst: str) -> None:
+        self.fs.mv(src, dst, recursive=True)
+
+    def read_bytes(self, path: str) -> bytes:
+        return self.fs.cat_file(path)
+
+    def write_bytes(self, path: str, payload: bytes) -> None:
+        self.fs.pipe_file(path, payload)  # загрузка объекта атомарна
+
+    def temp_path(self, path: str) -> str:
+        return os.path.join(tempfile.gettempdir(), f"nodecache-{uuid.uuid4().hex}.tmp")
+
+    def commit(self, tmp_path: str, path: str) -> None:
+        self.fs.put_file(tmp_path, path)
+        os.unlink(tmp_path)
+
+    def rmtree(self, path: str) -> None:
+        self.fs.rm(path, recursive=True)
+
+    def remove(self, path: str) -> None:
+        self.fs.rm_file(path)
+
+    def du(self, path: str) -> int:
+        """Байты объектов под префиксом"""
+        return int(self.fs.du(path, total=True))
+
+    def link(self, src: str, dst: str) -> None:
+        """Копия на стороне хранилища (для S3 — CopyObject), без скачивания"""
+        self.fs.copy(src, dst)
+
+    def lock(self, path: str, timeout: float, ttl: float):
+        """На объектных хранилищах flock нет — узел защищается lease-файлом"""
+        return hold_lease(self, path, timeout, ttl)
+
+    def glob(self, pattern: str) -> list[str]:
+        return self.fs.glob(pattern)
+
+    @contextmanager
+    def open_input(self, path: str):
+        """Локальная копия из read-through уровня или открытый удалённый файл"""
+        if self.read_tier is not None:
+            with self.read_tier.local_copy(self, path) as local_path:
+                yield local_path
+        else:
+            with self.fs.open(path, "rb") as f:
+                yield f
+
+
+StorageBackend = LocalStorage | FsspecStorage
+
+
+def make_storage(
+    storage_root: str = "",
+    storage_options: Optional[dict] = None,
+    read_tier: Optional[LocalReadThroughTier] = None,
+) -> StorageBackend:
+    """Локальная ФС для обычных путей, fsspec — для URL с протоколом (кроме file://)"""
+    if "://" in storage_root and not storage_root.startswith("file://"):
+        return FsspecStorage(storage_root, storage_options, read_tier=read_tier)
+    return LocalStorage()
+
 
 class CacheManager:
     CACHE_ROOT = "CACHE/CACHE_OPT/projects"
+    # общее content-addressed хранилище таблиц (при dedup=True)
+    OBJECTS_ROOT = "CACHE/CACHE_OPT/objects"
+    MANIFEST_NAME = "manifest.json"
+    # отметка последнего чтения узла для вытеснения по LRU; обновляется не чаще ACCESS_TOUCH_INTERVAL
+    ACCESS_MARKER = ".last_access"
+    ACCESS_TOUCH_INTERVAL = 60.0
+    MANIFEST_VERSION = 1
+    # запись узла: под блокировкой узла в новый снимок gen-{N}-…, затем атомарная замена манифеста
+    LOCK_NAME = ".lock"
+    LOCK_TIMEOUT = 600.0  # сколько ждать писателя того же узла, секунд
+    LEASE_TTL = (
+        600.0  # через сколько lease упавшего писателя считается свободным (remote)
+    )
+    KEEP_GENERATIONS = (
+        2  # сколько последних снимков хранить для читателей старого манифеста
+    )
+    READ_FORMATS = ("pandas", "arrow", "pandas_arrow")
+    # Arrow IPC файлы узла для передачи соседним процессам (publish_node / attach)
+    HANDOFF_DIR = "handoff"
+    HANDOFF_NAME = "handoff.json"
+    # превью и статистика колонок таблиц (profile=True): {снимок}/PROFILE_DIR/{key}.parquet|.json
+    PROFILE_DIR = "_profile"
+    PREVIEW_ROWS = 100
+    PROFILE_TOP_VALUES = 10
+    # общий in-memory уровень перед parquet, например: CacheManager.memory_tier = MemoryCacheTier(1 << 30)
+    memory_tier: Optional[MemoryCacheTier] = None
+    # общий пул потоков для async-API (asave_node, aread_data_cache)
+    ASYNC_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+    _async_executor: Optional[ThreadPoolExecutor] = None
+    _async_executor_lock = threading.Lock()
+    # приёмник метрик (InMemoryMetrics, CallbackMetrics или любой объект с record(event))
+    metrics = None
+    # фабрика span'ов трассировки: tracer(name, attributes) -> context manager,
+    # например: lambda name, attrs: otel_tracer.start_as_current_span(name, attributes=attrs)
+    tracer: Optional[Callable[[str, dict], Any]] = None
 
     def __init__(
         self,
@@ -28,6 +698,14 @@ class CacheManager:
         storage_options: Optional[
             dict
         ] = None,  # для s3: {"key": "...", "secret": "..."}
+        max_workers: int = 1,  # > 1 — параллельная запись/чтение таблиц узла
+        dedup: bool = False,  # хранить одинаковые таблицы один раз в OBJECTS_ROOT
+        skip_unchanged: bool = True,  # не перезаписывать таблицы с прежним fingerprint
+        profile: bool = False,  # сохранять превью и статистику колонок рядом с таблицей
+        row_group_size: Optional[int] = None,  # задаёт row_group_size в write_policy
+        write_policy: str | WritePolicy = "default",
+        key_write_policies: Optional[dict[str, str | WritePolicy]] = None,
+        read_tier: Optional[LocalReadThroughTier] = None,  # локальный диск перед remote
         **kwargs,
     ):
         self.metadata_store: list = []
@@ -36,23 +714,210 @@ class CacheManager:
         self.cache_dir = cache_dir
         self.nodes_dir = nodes_dir
         self.storage_options = storage_options or {}
+        self.storage = make_storage(self.storage_root, self.storage_options, read_tier)
+        self.root = self.cache_root(self.storage_root, cache_dir, nodes_dir)
+        self.max_workers = max(1, max_workers)
+        if dedup and not self.storage.is_local:
+            raise ValueError("Deduplication is supported only for local storage")
+        self.dedup = dedup
+        self.skip_unchanged = skip_unchanged
+        self.profile = profile
+        self.write_policy = resolve_write_policy(write_policy)
+        if row_group_size is not None:
+            # одна настройка для таблиц и потоков: размер row group живёт в политике
+            self.write_policy = replace(
+                self.write_policy, row_group_size=row_group_size
+            )
+        # переопределения политики записи для отдельных ключей
+        self.key_write_policies = {
+            key: resolve_write_policy(policy)
+            for key, policy in (key_write_policies or {}).items()
+        }
         self.path = ""
         self.node_id = None
         self.project_id: str | None = None
-        self._remote_keys = []  # список ключей удаленных данных, чтоб не записывать их в кэш
+        # ключи удаленных данных, чтоб не записывать их в кэш
+        self._remote_keys: set[str] = set()
+        # путь таблицы в узле -> фактический файл, схема, строки, размер, хэш, ссылка на blob
+        self.artifacts: dict[str, dict] = {}
+        # фактический путь файла (blob, датасет) -> ключ в artifacts, см. artifact_info
+        self._artifact_index: dict[str, str] = {}
+        self._pending_save: Optional[asyncio.Task] = None  # последняя фоновая запись
+        self.recompute_cost: Optional[float] = None  # секунды на пересчёт узла
+        self.generation = 0  # номер снимка узла, на который указывает манифест
+        self.cache_key: Optional[str] = None  # ключ входов узла от графа (см. is_valid)
+        self.fingerprint: Optional[str] = None  # fingerprint содержимого всего узла
+        self.handoff_token: Optional[str] = None  # из какого handoff записан снимок
+        self._last_touch = 0.0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pending_save"] = None  # asyncio.Task не сериализуется
+        return state
+
+    def __setstate__(self, state):
+        # for backward compatibility: в объекте из pickle старой версии нет атрибутов,
+        # добавленных позже (хранилище, артефакты, снимки...), — значения по умолчанию
+        # берём у нового экземпляра с теми же параметрами хранилища
+        defaults = type(self)(
+            state.get("storage_root", ""),
+            state.get("cache_dir", "CACHE_test"),
+            state.get("nodes_dir", "nodes"),
+            storage_options=state.get("storage_options"),
+        )
+        self.__dict__.update(defaults.__dict__)
+        self.__dict__.update(state)
+        # раньше ключи удаленных данных хранились списком
+        self._remote_keys = set(self._remote_keys)
+
+    @classmethod
+    def cache_root(
+        cls,
+        storage_root: str = "",
+        cache_dir: str = "CACHE_test",
+        nodes_dir: str = "nodes",
+    ) -> str:
+        """
+        Корень кэша узлов: CACHE_ROOT по умолчанию или {storage_root}/{cache_dir}/{nodes_dir}.
+        ``file://`` — локальная ФС (см. make_storage), схема из пути убирается.
+        """
+        if not storage_root:
+            return cls.CACHE_ROOT
+        storage_root = storage_root.removeprefix("file://")
+        return f"{storage_root.rstrip('/')}/{cache_dir}/{nodes_dir}"
+
+    @classmethod
+    def open(cls, project_id: str | int, node_id: str, **kwargs) -> "CacheManager":
+        """
+        Восстанавливает CacheManager узла из манифеста, без пересчёта узла и без pickle.
+
+        :param project_id: идентификатор проекта.
+        :param node_id: идентификатор узла.
+        :param kwargs: параметры конструктора CacheManager.
+        :raises FileNotFoundError: если для узла нет манифеста.
+        :raises ValueError: если версия манифеста не поддерживается.
+        """
+        cache = cls(**kwargs)
+        cache.path = f"{cache.root}/{project_id}/{node_id}"
+        cache.reload()
+        logger.info(
+            "Cache restored from manifest for node %s in project_id %s",
+            node_id,
+            project_id,
+        )
+        return cache
+
+    def reload(self) -> None:
+        """
+        Перечитывает манифест узла: метаданные переключаются на последний опубликованный снимок.
+
+        :raises FileNotFoundError: если для узла нет манифеста.
+        :raises ValueError: если версия манифеста не поддерживается.
+        """
+        manifest = json.loads(
+            self.storage.read_bytes(f"{self.path}/{self.MANIFEST_NAME}")
+        )
+        if manifest.get("version") != self.MANIFEST_VERSION:
+            raise ValueError(
+                f"Unsupported cache manifest version {manifest.get('version')!r} in {self.path}"
+            )
+
+        self.project_id = manifest["project_id"]
+        self.node_id = manifest["node_id"]
+        self.metadata_store = manifest["metadata"]
+        self._remote_keys = set(manifest["remote_keys"])
+        self.artifacts = manifest["artifacts"]
+        self.recompute_cost = manifest.get("recompute_cost")
+        self.generation = manifest.get("generation", 0)
+        self.cache_key = manifest.get("cache_key")
+        self.fingerprint = manifest.get("fingerprint")
+        self.handoff_token = manifest.get("handoff")
+
+    @classmethod
+    def read_cache_key(
+        cls, project_id: str | int, node_id: str, **kwargs
+    ) -> Optional[str]:
+        """cache_key, с которым узел был сохранён; None, если кэша узла нет"""
+        cache = cls(**kwargs)
+        manifest = read_manifest(
+            cache.storage, f"{cache.root}/{project_id}/{node_id}", cls.MANIFEST_NAME
+        )
+        return manifest.get("cache_key")
+
+    @classmethod
+    def is_valid(
+        cls, project_id: str | int, node_id: str, cache_key: str, **kwargs
+    ) -> bool:
+        """
+        Проверка до выполнения узла: кэш собран для тех же входов и его можно читать.
+        Читается только манифест, сами таблицы не открываются.
+
+        :param cache_key: ключ входов узла, например ``make_cache_key(params, *upstream_fingerprints)``.
+        :param kwargs: параметры конструктора CacheManager.
+        """
+        return (
+            cache_key is not None
+            and cls.read_cache_key(project_id, node_id, **kwargs) == cache_key
+        )
+
+    @staticmethod
+    def make_cache_key(*parts) -> str:
+        """Детерминированный ключ из параметров узла и fingerprint'ов входов"""
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def write_manifest(self) -> str:
+        """Атомарно записывает манифест узла рядом с parquet-файлами"""
+        self.fingerprint = node_fingerprint(self.metadata_store, self.artifacts)
+        manifest = {
+            "version": self.MANIFEST_VERSION,
+            "project_id": self.project_id,
+            "node_id": self.node_id,
+            "metadata": self.metadata_store,
+            "remote_keys": sorted(self._remote_keys),
+            "artifacts": self.artifacts,
+            "recompute_cost": self.recompute_cost,
+            "generation": self.generation,
+            "cache_key": self.cache_key,
+            "fingerprint": self.fingerprint,
+            # снимок записан из handoff (publish_node) с этим токеном
+            "handoff": getattr(self, "handoff_token", None),
+            "saved_at": time.time(),
+        }
+        manifest_path = f"{self.path}/{self.MANIFEST_NAME}"
+        self.storage.write_bytes(
+            manifest_path,
+            json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode(),
+        )
+        return manifest_path
 
     def create_folders(self, node_id: str, project_id: str | int):
         """Создание папок для хранения кэша данных узла"""
         if node_id and project_id:
-            logger.info(
-                "Creating path for project_id: %s, node_id: %s", project_id, node_id
-            )
-            self.path = f"{self.CACHE_ROOT}/{project_id}/{node_id}"
-            create_folder(self.path)
-            logger.info("Created path %s", self.path)
+            self.path = f"{self.root}/{project_id}/{node_id}"
+            self.storage.makedirs(self.path)
+            logger.debug("Created path %s", self.path)
 
-    def save_node(self, node_id: str, project_id: str, df: list):
-        logger.info(
+    def save_node(
+        self,
+        node_id: str,
+        project_id: str,
+        df: list,
+        recompute_cost: Optional[float] = None,
+        cache_key: Optional[str] = None,
+    ):
+        """
+        Сохраняет выход узла и манифест.
+
+        ``recompute_cost`` — сколько секунд стоит пересчитать узел; используется
+        CacheQuotaManager, чтобы в первую очередь вытеснять дешёвые в пересчёте узлы.
+        ``cache_key`` — ключ входов узла, по которому граф до выполнения узла
+        проверяет, актуален ли кэш (``is_valid``).
+
+        Таблица, fingerprint которой совпал с прошлой записью, не кодируется заново:
+        в новый снимок попадает тот же файл (``skip_unchanged``).
+        """
+        logger.debug(
             "Start saving data for node %s in project_id %s", node_id, project_id
         )
         self.project_id = project_id
@@ -61,125 +926,1517 @@ class CacheManager:
         if self.node_id is None:
             raise ValueError("Fail to detect node for data saving")
 
-        logger.info(
-            "Start creating folders for node %s in project_id %s", node_id, project_id
+        with self._span("node_cache.save_node"):
+            self.create_folders(self.node_id, project_id=self.project_id)
+            with self.node_lock():
+                self._save_node(df, recompute_cost, cache_key)
+
+    @contextmanager
+    def node_lock(self):
+        """
+        Блокировка записи узла: писатели одного узла выполняются по очереди, разных — параллельно.
+        Читателям блокировка не нужна — они видят опубликованный манифест и его снимок.
+        """
+        with self.storage.lock(
+            f"{self.path}/{self.LOCK_NAME}", self.LOCK_TIMEOUT, self.LEASE_TTL
+        ):
+            yield
+
+    def _save_node(
+        self,
+        df: list,
+        recompute_cost: Optional[float],
+        cache_key: Optional[str],
+        handoff_token: Optional[str] = None,
+    ):
+        if self.memory_tier is not None:
+            self.memory_tier.invalidate(self.path)
+
+        manifest = read_manifest(self.storage, self.path, self.MANIFEST_NAME)
+        previous_artifacts = manifest.get("artifacts", {})
+        # каждая запись идёт в новый снимок: файлы опубликованной версии не перезаписываются,
+        # и читатель никогда не увидит смесь таблиц из разных записей
+        self.generation = manifest.get("generation", 0) + 1
+        generation_path = (
+            f"{self.path}/gen-{self.generation:06d}-{uuid.uuid4().hex[:8]}"
         )
+        self.storage.makedirs(generation_path)
 
-        self.create_folders(self.node_id, project_id=project_id)
-        logger.info("Folders created for node %s in project_id %s", node_id, project_id)
+        self.artifacts = {}
+        self._remote_keys = set()  # ссылки прошлой записи узла не наследуются
+        self.recompute_cost = recompute_cost
+        self.cache_key = cache_key
+        self.handoff_token = handoff_token
+        try:
+            self.metadata_store = self.save_data_list(
+                df,
+                generation_path,
+                self._remote_keys,
+                previous_artifacts=previous_artifacts if self.skip_unchanged else None,
+            )
+            self.write_manifest()
+        except BaseException:
+            # снимок без манифеста никто не прочитает: убираем его вместе со ссылками
+            # на blob'ы, которые успели создать таблицы этого снимка
+            with suppress(FileNotFoundError):
+                self.storage.rmtree(generation_path)
+            if self.dedup:
+                collect_orphan_refs(self.OBJECTS_ROOT)
+            # состояние экземпляра возвращаем к опубликованному манифесту, если он есть
+            with suppress(FileNotFoundError, ValueError):
+                self.reload()
+            raise
+        if handoff_token is None:
+            self._release_superseded_handoff()
 
-        self.metadata_store = self.save_data_list(df, self.path, self._remote_keys)
+        # ссылки на blob'ы, которые узел больше не использует, освобождаем после записи манифеста
+        for data_path, info in previous_artifacts.items():
+            if (
+                info.get("ref")
+                and self.artifacts.get(data_path, {}).get("ref") != info["ref"]
+            ):
+                release_blob_ref(info["ref"])
+            # датасет ключа (append_node), который save_node заменил обычным файлом
+            elif "files" in info and data_path not in self.artifacts:
+                with suppress(FileNotFoundError):
+                    self.storage.rmtree(data_path)
+            # файл в корне узла — раскладка до снимков
+            elif data_path.rsplit("/", 1)[0] == self.path:
+                with suppress(FileNotFoundError):
+                    self.storage.remove(data_path)
+        self._collect_generations()
         logger.info("Data saved in %s folder", self.path)
 
-    def save_data_list(
-        self, data_list: list, path: str, remote_keys: list = None, clean_names=False
-    ) -> list[dict]:
-        """"""
-        remote_keys = remote_keys or []
-        result_list = []
-        for data_el in data_list:
-            el = {"name": data_el["name"], "data": {}}
-            for df_key, data in data_el["data"].items():
-                if isinstance(data, str):  # ссылка на удаленные данные
-                    remote_keys.append(df_key)
-                    el["data"][df_key] = data
-                elif not isinstance(data, pl_DataFrame):
-                    df_key_clean = df_key.rsplit(":", 1)[-1] if clean_names else df_key
+    def _collect_generations(self) -> None:
+        """
+        Удаляет снимки старше KEEP_GENERATIONS последних. Читатель, у которого остался
+        манифест удалённого снимка, перечитывает манифест (см. read_data_cache).
+        """
+        for generation_path in self.storage.glob(f"{self.path}/gen-*"):
+            number = int(generation_path.rsplit("/", 1)[-1].split("-")[1])
+            if number <= self.generation - self.KEEP_GENERATIONS:
+                with suppress(FileNotFoundError):
+                    self.storage.rmtree(generation_path)
+
+    def _span(self, name: str, **attributes):
+        tracer = type(self).tracer  # функция на классе, без привязки к self
+        if tracer is None:
+            return nullcontext()
+        attributes.update(project_id=str(self.project_id), node_id=str(self.node_id))
+        return tracer(name, attributes)
+
+    def _record(self, op: str, mode: str, started: float, **fields) -> None:
+        """Отправляет событие метрик; ``started`` — значение time.perf_counter()"""
+        if self.metrics is None:
+            return
+        self.metrics.record(
+            {
+                "op": op,
+                "mode": mode,
+                "project_id": self.project_id,
+                "node_id": self.node_id,
+                "seconds": time.perf_counter() - started,
+                **fields,
+            }
+        )
+
+    @contextmanager
+    def _open_input(self, path: str):
+        """
+        storage.open_input с замером задержки открытия файла.
+
+        Локальное хранилище отдаёт путь, а файл открывает уже pyarrow/polars, поэтому
+        для него метрика ``open`` не пишется: замер был бы нулевым.
+        """
+        started = time.perf_counter()
+        with self.storage.open_input(path) as source:
+            if not self.storage.is_local:
+                self._record("open", type(self.storage).__name__, started, path=path)
+            yield source
+
+    @classmethod
+    def _get_async_executor(cls) -> ThreadPoolExecutor:
+        with cls._async_executor_lock:
+            if cls._async_executor is None:
+                cls._async_executor = ThreadPoolExecutor(
+                    max_workers=cls.ASYNC_WORKERS, thread_name_prefix="NodeCacheAsync"
+                )
+            return cls._async_executor
+
+    def save_node_behind(
+        self,
+        node_id: str,
+        project_id: str,
+        df: list,
+        recompute_cost: Optional[float] = None,
+        cache_key: Optional[str] = None,
+    ) -> asyncio.Task:
+        """
+        Запускает save_node в фоне (write-behind) и сразу возвращает задачу.
+
+        Граф может продолжать выполнение, пока выход узла пишется на диск; дождаться
+        записи можно через ``await task`` или ``aflush``. Фоновые записи одного
+        CacheManager выполняются строго по очереди, а ``aread_data_cache`` ждёт
+        последнюю из них, поэтому чтение всегда видит записанные данные.
+        """
+        loop = asyncio.get_running_loop()
+        previous = self._pending_save
+
+        async def run():
+            if previous is not None:
+                # ошибку предыдущей записи получает тот, кто ждёт её задачу
+                with suppress(Exception):
+                    await previous
+            await loop.run_in_executor(
+                self._get_async_executor(),
+                self.save_node,
+                node_id,
+                project_id,
+                df,
+                recompute_cost,
+                cache_key,
+            )
+
+        task = loop.create_task(run())
+        task.add_done_callback(self._log_save_failure)
+        self._pending_save = task
+        return task
+
+    def _log_save_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and (err := task.exception()) is not None:
+            logger.error(
+                "Background save failed for node %s in project_id %s: %r",
+                self.node_id,
+                self.project_id,
+                err,
+            )
+
+    async def asave_node(
+        self,
+        node_id: str,
+        project_id: str,
+        df: list,
+        recompute_cost: Optional[float] = None,
+        cache_key: Optional[str] = None,
+    ) -> None:
+        """Асинхронный save_node: кодирование и запись выполняются вне event loop"""
+        await self.save_node_behind(node_id, project_id, df, recompute_cost, cache_key)
+
+    async def aflush(self) -> None:
+        """
+        Ждёт завершения последней фоновой записи узла. Ошибка записи поднимается один
+        раз: после этого задача забывается, и следующие чтения её не повторяют.
+        """
+        pending = self._pending_save
+        if pending is None:
+            return
+        try:
+            await pending
+        finally:
+            # за время ожидания могли запустить новую запись — её не трогаем
+            if self._pending_save is pending:
+                self._pending_save = None
+
+    async def aread_data_cache(self, **kwargs) -> list[pd.DataFrame]:
+        """Асинхронный read_data_cache; сначала дожидается фоновой записи узла"""
+        await self.aflush()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._get_async_executor(),
+            functools.partial(self.read_data_cache, **kwargs),
+        )
+
+    def publish_node(
+        self,
+        node_id: str,
+        project_id: str,
+        df: list,
+        recompute_cost: Optional[float] = None,
+        cache_key: Optional[str] = None,
+    ) -> Future:
+        """
+        Публикует выход узла для соседних процессов без parquet и без pickle.
+
+        Каждая таблица один раз пишется несжатым Arrow IPC файлом в
+        ``{узел}/HANDOFF_DIR/{token}/``; процессы-потребители получают её через
+        ``attach`` как memory-mapped ``pyarrow.Table`` — без декодирования и копий
+        (если кэш лежит на tmpfs, например /dev/shm, — прямо из общей памяти).
+        Запись parquet (``save_node``) выполняется в фоне из тех же файлов;
+        возвращается Future этой записи.
+
+        Только для локального хранилища: memory map удалённого файла невозможен.
+        """
+        if not self.storage.is_local:
+            raise ValueError("Handoff is supported only for local storage")
+        self.project_id = project_id
+        self.node_id = node_id or self.node_id
+        if self.node_id is None:
+            raise ValueError("Fail to detect node for data saving")
+
+        with self._span("node_cache.publish_node"):
+            self.create_folders(self.node_id, project_id=self.project_id)
+            token = uuid.uuid4().hex
+            handoff_path = f"{self.path}/{self.HANDOFF_DIR}/{token}"
+            os.makedirs(handoff_path)
+            elements = []
+            try:
+                for data_el in df:
+                    el = {"name": data_el["name"], "data": {}, "remote": []}
+                    for df_key, data in data_el["data"].items():
+                        if isinstance(data, str):  # ссылка на удаленные данные
+                            el["data"][df_key] = data
+                            el["remote"].append(df_key)
+                        elif isinstance(data, pl_DataFrame):
+                            warnings.warn(INCOMPLETE_DATA_WARNING, UserWarning)
+                        else:
+                            data_path = f"{handoff_path}/{df_key}.arrow"
+                            if self._write_ipc(data, data_path):
+                                el["data"][df_key] = data_path
+                    elements.append(el)
+            except BaseException:
+                shutil.rmtree(handoff_path, ignore_errors=True)
+                raise
+
+            published_at = time.time()
+            self.storage.write_bytes(
+                f"{self.path}/{self.HANDOFF_NAME}",
+                json.dumps(
+                    {
+                        "version": self.MANIFEST_VERSION,
+                        "token": token,
+                        "published_at": published_at,
+                        "elements": elements,
+                    },
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ).encode(),
+            )
+            # прежние handoff'ы: потребители, которые их уже открыли, держат mmap до закрытия
+            for old_path in self.storage.glob(f"{self.path}/{self.HANDOFF_DIR}/*"):
+                if old_path.rsplit("/", 1)[-1] != token:
+                    shutil.rmtree(old_path, ignore_errors=True)
+
+        # фоновая запись идёт через копию менеджера: следующий publish_node другого узла
+        # меняет path, node_id и артефакты этого экземпляра раньше, чем задача запустится
+        worker = self._detached()
+        future = self._get_async_executor().submit(
+            worker._persist_handoff, token, published_at, recompute_cost, cache_key
+        )
+        future.add_done_callback(worker._log_save_failure)
+        return future
+
+    def _detached(self) -> "CacheManager":
+        """Поверхностная копия с тем же узлом и хранилищем, не связанная с этим экземпляром"""
+        worker = object.__new__(type(self))
+        worker.__dict__.update(self.__dict__)
+        worker._pending_save = None
+        return worker
+
+    def _write_ipc(self, data, data_path: str) -> bool:
+        """Пишет таблицу или поток чанков несжатым Arrow IPC файлом; False — писать нечего"""
+        tmp_path = self.storage.temp_path(data_path)
+        chunks = data if is_chunk_stream(data) else iter([data])
+        writer = None
+        try:
+            for chunk in chunks:
+                if not is_chunk_stream(data) and isinstance(chunk, bytes):
+                    chunk = pickle.loads(chunk)
+                    if not isinstance(chunk, pd.DataFrame):
+                        return False
+                table = chunk_to_arrow(chunk)
+                if writer is None:
+                    writer = pa.ipc.new_file(tmp_path, table.schema)
+                writer.write_table(table)
+            if writer is None:  # пустой поток
+                return False
+            writer.close()
+            writer = None
+            os.replace(tmp_path, data_path)
+            return True
+        finally:
+            if writer is not None:
+                writer.close()
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+
+    def _persist_handoff(
+        self,
+        token: str,
+        published_at: float,
+        recompute_cost: Optional[float],
+        cache_key: Optional[str],
+    ) -> None:
+        """Фоновая запись parquet из handoff; устаревший handoff не пишется"""
+        with self.node_lock():
+            handoff = read_manifest(self.storage, self.path, self.HANDOFF_NAME)
+            manifest = read_manifest(self.storage, self.path, self.MANIFEST_NAME)
+            # узел опубликовали заново или уже сохранили более новые данные; снимок из
+            # прежнего handoff новее этого не считается, даже если записан позже
+            if handoff.get("token") != token:
+                return
+            if (
+                manifest.get("handoff") is None
+                and manifest.get("saved_at", 0.0) > published_at
+            ):
+                self._release_superseded_handoff()
+                return
+            df = [
+                {
+                    "name": el["name"],
+                    "data": {
+                        # RecordBatchReader — потоковая запись прямо из mmap, без сборки таблицы
+                        df_key: (
+                            path
+                            if df_key in el["remote"]
+                            else read_ipc(path).to_reader()
+                        )
+                        for df_key, path in el["data"].items()
+                    },
+                }
+                for el in handoff["elements"]
+            ]
+            self._save_node(df, recompute_cost, cache_key, handoff_token=token)
+
+    @classmethod
+    def attach(
+        cls,
+        project_id: str | int,
+        node_id: str,
+        read_format: str = "arrow",
+        **kwargs,
+    ) -> list:
+        """
+        Подключается к выходу узла, опубликованному ``publish_node`` другим процессом.
+
+        Таблицы возвращаются в формате ``read_data_cache``: ``"arrow"`` — memory-mapped
+        ``pyarrow.Table`` без копирования, ``"pandas_arrow"`` — pandas поверх ``pd.ArrowDtype``,
+        ``"pandas"`` — обычный pandas (с копированием в numpy). Если handoff нет или
+        узел после него сохранили заново, читается parquet-кэш узла.
+
+        :param kwargs: параметры конструктора CacheManager.
+        :raises FileNotFoundError: если у узла нет ни handoff, ни манифеста.
+        """
+        if read_format not in cls.READ_FORMATS:
+            raise ValueError(
+                f"Unknown read_format {read_format!r}, expected one of {cls.READ_FORMATS}"
+            )
+        cache = cls(**kwargs)
+        node_path = f"{cache.root}/{project_id}/{node_id}"
+        handoff = read_manifest(cache.storage, node_path, cls.HANDOFF_NAME)
+        manifest = read_manifest(cache.storage, node_path, cls.MANIFEST_NAME)
+        # save_node и append_node удаляют handoff, который вытеснили, поэтому handoff
+        # новее снимка, записанного из любого handoff'а
+        if handoff and (
+            manifest.get("handoff") is not None
+            or manifest.get("saved_at", 0.0) < handoff["published_at"]
+        ):
+            with suppress(FileNotFoundError):  # handoff заменили, пока мы его читали
+                return [
+                    {
+                        "name": el["name"],
+                        "data": {
+                            (
+                                df_key
+                                if df_key in el["remote"]
+                                else normalize_key(df_key)
+                            ): (
+                                path
+                                if df_key in el["remote"]
+                                else arrow_to_format(read_ipc(path), read_format)
+                            )
+                            for df_key, path in el["data"].items()
+                        },
+                    }
+                    for el in handoff["elements"]
+                ]
+        return cls.open(project_id, node_id, **kwargs).read_data_cache(
+            read_format=read_format
+        )
+
+    def _release_superseded_handoff(self) -> None:
+        """
+        Удаляет handoff, который новый манифест сделал устаревшим: ``attach`` его
+        уже не отдаёт, а файлы IPC занимали бы место в узле до следующего publish_node.
+        """
+        if self.storage.is_local and os.path.isfile(f"{self.path}/{self.HANDOFF_NAME}"):
+            self.release_handoff()
+
+    def release_handoff(self) -> None:
+        """Удаляет handoff узла; parquet-кэш, если он уже записан, остаётся"""
+        if not self.path:
+            return
+        with suppress(FileNotFoundError):
+            self.storage.remove(f"{self.path}/{self.HANDOFF_NAME}")
+        with suppress(FileNotFoundError):
+            self.storage.rmtree(f"{self.path}/{self.HANDOFF_DIR}")
+
+    def save_data_list(
+        self,
+        data_list: list,
+        path: str,
+        remote_keys: Optional[set[str]] = None,
+        clean_names=False,
+        previous_artifacts: Optional[dict] = None,
+    ) -> list[dict]:
+        """
+        ``previous_artifacts`` — артефакты прошлой записи узла: таблица с тем же
+        fingerprint и политикой записи переиспользует прежний файл.
+        """
+        # прежние файлы ищем по имени: при новой записи меняется только папка снимка
+        previous = {
+            data_path.rsplit("/", 1)[-1]: info
+            for data_path, info in (previous_artifacts or {}).items()
+        }
+        if remote_keys is None:  # пустое множество тоже нужно заполнять, а не заменять
+            remote_keys = set()
+        result_list, tasks, targets = [], [], []
+        for data_el in data_list:
+            el = {"name": data_el["name"], "data": {}}
+            for df_key, data in data_el["data"].items():
+                if isinstance(data, str):  # ссылка на удаленные данные
+                    remote_keys.add(df_key)
+                    el["data"][df_key] = data
+                elif not isinstance(data, pl_DataFrame):
+                    df_key_clean = df_key.rsplit(":", 1)[-1] if clean_names else df_key
+
+                    data_path = f"{path}/{df_key_clean}.parquet"
+                    policy = self.key_write_policies.get(
+                        df_key_clean, self.write_policy
+                    )
+                    tasks.append(
+                        (
+                            (el["name"], df_key_clean),
+                            (
+                                data,
+                                data_path,
+                                policy,
+                                previous.get(f"{df_key_clean}.parquet"),
+                            ),
+                        )
+                    )
+                    targets.append((el["data"], df_key_clean, data_path))
+                    el["data"][df_key_clean] = data_path
+                else:
+                    # Если пришёл polars.DataFrame, то это значит, что данные годятся только для просмотра - их сохранять не надо
+                    warnings.warn(INCOMPLETE_DATA_WARNING, UserWarning)
+
+            result_list.append(el)
+
+        infos = self._map_artifacts(self._save_artifact, tasks)
+        for (el_data, df_key, data_path), (_, (data, *_)), info in zip(
+            targets, tasks, infos
+        ):
+            if info is None and is_chunk_stream(data):  # пустой поток — файла нет
+                del el_data[df_key]
+            elif info is not None:
+                el_data[df_key] = info["path"]  # при dedup — путь к общему blob'у
+                self.artifacts[data_path] = info
+
+        for el in result_list:
+            index_load_keys(el)
+        return result_list
+
+    def _map_artifacts(
+        self, func: Callable[..., Any], tasks: list[tuple[tuple[str, str], tuple]]
+    ) -> list:
+        """
+        Выполняет ``func(*args)`` для каждой задачи ``(key, args)``; ключ — пара
+        (имя элемента, ключ таблицы): один ключ таблицы бывает в нескольких элементах.
+
+        При ``max_workers > 1`` задачи выполняются в пуле потоков (pyarrow отпускает GIL
+        на кодировании/декодировании parquet). Результаты возвращаются в порядке задач,
+        ошибки собираются по ключам и поднимаются одним ``CacheArtifactError``.
+        """
+        results, errors = [None] * len(tasks), {}
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            for i, (key, args) in enumerate(tasks):
+                try:
+                    results[i] = func(*args)
+                except Exception as err:
+                    errors[key] = err
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(tasks)),
+                thread_name_prefix="NodeCache",
+            ) as pool:
+                futures = [pool.submit(func, *args) for _, args in tasks]
+                for i, ((key, _), future) in enumerate(zip(tasks, futures)):
+                    try:
+                        results[i] = future.result()
+                    except Exception as err:
+                        errors[key] = err
+
+        if errors:
+            raise CacheArtifactError(errors)
+        return results
+
+    def _save_artifact(
+        self,
+        data,
+        data_path: str,
+        policy: WritePolicy,
+        previous: Optional[dict] = None,
+    ) -> Optional[dict]:
+        started = time.perf_counter()
+        with self._span("node_cache.write", path=data_path):
+            info = self._write_artifact(data, data_path, policy, previous)
+        if info is not None:
+            info["write_policy"] = policy.name
+            if info.pop("reused", False):
+                mode = "unchanged"
+            else:
+                mode = "blob" if info.get("ref") else policy.name
+            self._record(
+                "write",
+                mode,
+                started,
+                path=data_path,
+                nbytes=info["num_bytes"],
+                rows=info["num_rows"],
+            )
+        return info
+
+    def _write_artifact(
+        self,
+        data,
+        data_path: str,
+        policy: WritePolicy,
+        previous: Optional[dict] = None,
+    ) -> Optional[dict]:
+        fingerprint = None
+        # поток не хэшируется заранее
+        if (self.dedup or self.skip_unchanged) and not is_chunk_stream(data):
+            if isinstance(data, bytes):
+                data = pickle.loads(data)
+            if isinstance(data, pd.DataFrame):
+                # object-колонки со смесью типов пишем как обычно, без fingerprint
+                with suppress(TypeError, ValueError):
+                    fingerprint = fingerprint_frame(data)
+
+        info = None
+        if fingerprint is not None and self.dedup:
+            info = self._save_blob(data, fingerprint, data_path, policy)
+        elif fingerprint is not None and is_unchanged(previous, fingerprint, policy):
+            info = self._reuse_file(previous, data_path)
+        if info is None:
+            info = self._write_file(data, data_path, policy)
+        if info is not None and fingerprint is not None:
+            info["fingerprint"] = fingerprint
+        if info is not None and self.profile:
+            info["profile"] = self._write_profile(data, info, data_path)
+        elif info is not None:
+            info.pop(
+                "profile", None
+            )  # переиспользованная таблица: превью прошлого снимка
+        return info
+
+    def _write_profile(self, data, info: dict, data_path: str) -> dict:
+        """
+        Сохраняет превью (первые PREVIEW_ROWS строк) и статистику колонок таблицы.
+
+        Число null, min и max берутся из статистик parquet только что записанного файла,
+        частые значения и недостающие статистики считаются по DataFrame в памяти.
+        Для неизменившейся таблицы (skip_unchanged) переносятся файлы прошлой записи.
+        """
+        preview_path, stats_path = profile_paths(data_path, self.PROFILE_DIR)
+        self.storage.makedirs(preview_path.rsplit("/", 1)[0])
+        previous = info.get("profile")
+        if info.get("reused") and previous:
+            try:
+                self.storage.link(previous["preview"], preview_path)
+                self.storage.link(previous["stats"], stats_path)
+                return {"preview": preview_path, "stats": stats_path}
+            except FileNotFoundError:  # прежний снимок уже удалён — считаем заново
+                pass
+
+        with self._open_input(info["path"]) as source:
+            parquet_file = pq.ParquetFile(source)
+            stats = parquet_profile(parquet_file.metadata)
+            batches = parquet_file.iter_batches(batch_size=self.PREVIEW_ROWS)
+            preview = pa.Table.from_batches(
+                list(itertools.islice(batches, 1)), parquet_file.schema_arrow
+            )
+        if isinstance(data, pd.DataFrame):
+            frame_profile(data, stats["columns"], self.PROFILE_TOP_VALUES)
+
+        tmp_path = self.storage.temp_path(preview_path)
+        try:
+            pq.write_table(preview, tmp_path)
+            self.storage.commit(tmp_path, preview_path)
+        finally:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+        self.storage.write_bytes(
+            stats_path,
+            json.dumps(stats, ensure_ascii=False, separators=(",", ":")).encode(),
+        )
+        return {"preview": preview_path, "stats": stats_path}
+
+    def _reuse_file(self, previous: dict, data_path: str) -> Optional[dict]:
+        """Переносит неизменившуюся таблицу в новый снимок без повторного кодирования"""
+        try:
+            self.storage.link(previous["path"], data_path)
+        except FileNotFoundError:  # прежний снимок уже удалён — пишем заново
+            return None
+        return {**previous, "path": data_path, "reused": True}
+
+    def _write_file(self, data, data_path: str, policy: WritePolicy) -> Optional[dict]:
+        # пишем во временный файл, описываем его локально и публикуем одной операцией
+        # хэш считается по байтам в момент записи, файл повторно не читается
+        tmp_path = self.storage.temp_path(data_path)
+        try:
+            with HashingWriter(tmp_path) as sink:
+                if is_chunk_stream(data):
+                    self._write_chunks(data, sink, policy)
+                else:
+                    self.save_df_to_parquet(data, sink, policy=policy)
+            # пустой поток и bytes с не-DataFrame внутри не сохраняются
+            if not sink.nbytes:
+                return None
+            info = describe_parquet(tmp_path, content_hash=sink.hexdigest())
+            info["path"] = data_path
+            self.storage.commit(tmp_path, data_path)
+            return info
+        finally:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+
+    def _save_blob(
+        self, df: pd.DataFrame, digest: str, data_path: str, policy: WritePolicy
+    ) -> dict:
+        """
+        Сохраняет таблицу в content-addressed хранилище один раз на содержимое.
+        Уже существующий blob не перезаписывается, даже если политика записи другая.
+
+        Счётчик ссылок — файлы в ``{blob}.refs/``, по одному на путь таблицы в узле.
+        Создание ссылки и снятие последней ссылки вместе с удалением blob'а идут под
+        блокировкой группы blob'ов (``blob_lock``), поэтому blob не удаляется между
+        созданием ссылки и проверкой blob'а. Сам blob пишется уже без блокировки:
+        пока ссылка есть, его никто не удалит.
+        """
+        blob_path = f"{self.OBJECTS_ROOT}/{digest[:2]}/{digest}.parquet"
+        ref_path = f"{blob_path}.refs/{quote(data_path, safe='')}"
+        with blob_lock(blob_path):
+            os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+            Path(ref_path).touch()
+
+        if not os.path.isfile(blob_path):
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            self.save_df_to_parquet(df, tmp_path, policy=policy)
+            os.replace(tmp_path, blob_path)
+
+        info = describe_parquet(blob_path, content_hash=digest)
+        info["ref"] = ref_path
+        return info
+
+    def _write_chunks(
+        self,
+        chunks: Iterable,
+        local_path: "str | HashingWriter",
+        policy: Optional[WritePolicy],
+    ) -> bool:
+        """
+        Потоково пишет чанки (``pd.DataFrame``, ``pa.RecordBatch``, ``pa.Table`` или
+        pickled ``bytes``) в один parquet-файл через ``ParquetWriter``.
+
+        В памяти держится не больше одного row group (``policy.row_group_size``)
+        и текущего чанка. Схема берётся из первого чанка, остальные приводятся к ней.
+
+        :return: False, если поток был пустым.
+        """
+        policy = policy or self.write_policy
+        row_group_size = policy.row_group_size
+        writer, buffer, buffered_rows = None, [], 0
+        try:
+            for chunk in chunks:
+                table = chunk_to_arrow(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        local_path, table.schema, **policy.writer_kwargs()
+                    )
+                elif table.schema != writer.schema:
+                    table = table.cast(writer.schema)
+
+                if row_group_size is None:
+                    writer.write_table(table)
+                    continue
+
+                buffer.append(table)
+                buffered_rows += table.num_rows
+                if buffered_rows >= row_group_size:
+                    pending = pa.concat_tables(buffer)
+                    full_rows = buffered_rows - buffered_rows % row_group_size
+                    writer.write_table(
+                        pending.slice(0, full_rows), row_group_size=row_group_size
+                    )
+                    buffer = [pending.slice(full_rows)]
+                    buffered_rows -= full_rows
+
+            if writer is None:
+                return False
+            if buffered_rows:
+                writer.write_table(pa.concat_tables(buffer))
+            return True
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def save_df_to_parquet(
+        self,
+        df: pd.DataFrame | bytes,
+        data_path: "str | HashingWriter",
+        policy: Optional[WritePolicy] = None,
+    ):
+        policy = policy or self.write_policy
+        if isinstance(df, bytes):
+            df = pickle.loads(df)
+        if isinstance(df, pd.DataFrame):
+            df.to_parquet(
+                data_path,
+                index=False,
+                # для временных локальных файлов pandas не принимает storage_options
+                storage_options=(
+                    self.storage_options
+                    if isinstance(data_path, str) and "://" in data_path
+                    else None
+                ),
+                row_group_size=policy.row_group_size,
+                **policy.writer_kwargs(),
+            )
+
+    def append_node(
+        self,
+        node_id: str,
+        project_id: str,
+        df: list,
+        partition_by: Optional[str | dict[str, str]] = None,
+        mode: str = "append",
+        recompute_cost: Optional[float] = None,
+        cache_key: Optional[str] = None,
+    ):
+        """
+        Дописывает выход узла в партиционированные датасеты, не перезаписывая старые файлы.
+
+        Каждый ключ хранится папкой ``{key}/`` с parquet-файлами: по одному на партию
+        записи (``batch-000001-….parquet``) или, с ``partition_by``, по папке на значение
+        колонки (``{col}={value}/part-….parquet``). Список файлов с числом строк и
+        значением партиции лежит в манифесте, поэтому запись стоит пропорционально
+        дельте, а чтение с фильтром по колонке партиционирования открывает только
+        нужные партиции.
+
+        Ключи, которых нет в дельте, остаются как есть. Ключ, ранее сохранённый через
+        ``save_node`` одним файлом, дописать нельзя — его нужно перезаписать save_node.
+
+        :param partition_by: колонка партиционирования — общая или ``{key: column}``.
+        :param mode: ``"append"`` — добавить файлы; ``"upsert"`` — заменить партиции,
+            значения которых есть в дельте (нужен ``partition_by``).
+        :param recompute_cost: см. ``save_node``; по умолчанию остаётся прежним.
+        :param cache_key: см. ``save_node``; прежний ключ после дозаписи не сохраняется.
+        """
+        if mode not in ("append", "upsert"):
+            raise ValueError(
+                f"Unknown append mode {mode!r}, expected 'append' or 'upsert'"
+            )
+        self.project_id = project_id
+        self.node_id = node_id or self.node_id
+        if self.node_id is None:
+            raise ValueError("Fail to detect node for data saving")
+
+        with self._span("node_cache.append_node", mode=mode):
+            self.create_folders(self.node_id, project_id=self.project_id)
+            with self.node_lock():
+                self._append_node(df, partition_by, mode, recompute_cost, cache_key)
+
+    def _append_node(
+        self,
+        df: list,
+        partition_by: Optional[str | dict[str, str]],
+        mode: str,
+        recompute_cost: Optional[float],
+        cache_key: Optional[str],
+    ):
+        if self.memory_tier is not None:
+            self.memory_tier.invalidate(self.path)
+
+        manifest = read_manifest(self.storage, self.path, self.MANIFEST_NAME)
+        self.generation = manifest.get("generation", 0)
+        self.metadata_store = manifest.get("metadata", [])
+        self._remote_keys = set(manifest.get("remote_keys", []))
+        self.artifacts = manifest.get("artifacts", {})
+        if recompute_cost is None:
+            recompute_cost = manifest.get("recompute_cost")
+        self.recompute_cost = recompute_cost
+        self.cache_key = cache_key
+        self.handoff_token = None  # дозаписанного в handoff нет
+
+        elements = {el["name"]: el for el in self.metadata_store}
+        tasks, targets = [], []
+        for data_el in df:
+            if (el := elements.get(data_el["name"])) is None:
+                el = elements[data_el["name"]] = {"name": data_el["name"], "data": {}}
+                self.metadata_store.append(el)
+
+            for df_key, data in data_el["data"].items():
+                if isinstance(data, str):  # ссылка на удаленные данные
+                    self._remote_keys.add(df_key)
+                    el["data"][df_key] = data
+                    continue
+                if isinstance(data, pl_DataFrame):
+                    warnings.warn(INCOMPLETE_DATA_WARNING, UserWarning)
+                    continue
+
+                dataset_path = f"{self.path}/{df_key}"
+                info = self.artifacts.get(dataset_path)
+                if (
+                    info is None
+                    and df_key in el["data"]
+                    and df_key not in self._remote_keys
+                ):
+                    raise ValueError(
+                        f"Key {df_key!r} is cached as a single file; overwrite it with save_node"
+                    )
+                column = (
+                    partition_by.get(df_key)
+                    if isinstance(partition_by, dict)
+                    else partition_by
+                )
+                if info is not None and info.get("partition_by") != column:
+                    raise ValueError(
+                        f"Key {df_key!r} is partitioned by {info.get('partition_by')!r}, got {column!r}"
+                    )
+                if mode == "upsert" and column is None:
+                    raise ValueError(f"Upsert of key {df_key!r} requires partition_by")
+
+                policy = self.key_write_policies.get(df_key, self.write_policy)
+                tasks.append(
+                    (
+                        (el["name"], df_key),
+                        (data, dataset_path, info, column, mode, policy),
+                    )
+                )
+                targets.append((el["data"], df_key, dataset_path))
+
+        results = self._map_artifacts(self._append_dataset, tasks)
+        stale_files = []
+        for (el_data, df_key, dataset_path), (info, stale) in zip(targets, results):
+            if info is None:  # пустая дельта для нового ключа — датасета нет
+                continue
+            self._remote_keys.discard(df_key)
+            el_data[df_key] = dataset_path
+            self.artifacts[dataset_path] = info
+            stale_files.extend(stale)
+        for el in self.metadata_store:
+            index_load_keys(el)
+        self.write_manifest()
+        self._release_superseded_handoff()
+
+        # заменённые при upsert файлы удаляем только после записи манифеста
+        for file_path in stale_files:
+            with suppress(FileNotFoundError):
+                self.storage.remove(file_path)
+        logger.info("Data appended in %s folder", self.path)
+
+    def _append_dataset(
+        self,
+        data,
+        dataset_path: str,
+        info: Optional[dict],
+        column: Optional[str],
+        mode: str,
+        policy: WritePolicy,
+    ) -> tuple[Optional[dict], list[str]]:
+        """Пишет дельту ключа новыми файлами датасета; возвращает описание и заменённые файлы"""
+        started = time.perf_counter()
+        files = list(info["files"]) if info else []
+        batch = max((f["batch"] for f in files), default=0) + 1
+        schema = info["schema"] if info else None
+
+        if column is None:
+            parts = [(None, data)]
+        else:
+            if isinstance(data, bytes):
+                data = pickle.loads(data)
+            if not isinstance(data, pd.DataFrame):
+                raise TypeError(
+                    f"partition_by requires a pandas DataFrame, got {type(data).__name__}"
+                )
+            parts = data.groupby(column, sort=False, dropna=False)
+
+        written = []
+        try:
+            for value, part in parts:
+                suffix = f"{batch:06d}-{uuid.uuid4().hex[:8]}.parquet"
+                entry = {"batch": batch}
+                if column is None:
+                    file_path = f"{dataset_path}/batch-{suffix}"
+                else:
+                    entry["partition_dir"] = f"{column}={quote(str(value), safe='')}"
+                    if (value := partition_value(value)) is not None:
+                        entry["partition_value"] = value
+                    file_path = f"{dataset_path}/{entry['partition_dir']}/part-{suffix}"
+
+                self.storage.makedirs(file_path.rsplit("/", 1)[0])
+                file_info = self._write_file(part, file_path, policy)
+                if file_info is None:
+                    continue
+                written.append(file_path)
+                if schema is None:
+                    schema = file_info["schema"]
+                elif file_info["schema"] != schema:
+                    raise ValueError(
+                        f"Schema of appended data differs from dataset {dataset_path}: "
+                        f"{file_info['schema']} != {schema}"
+                    )
+                entry.update(
+                    path=file_path,
+                    num_rows=file_info["num_rows"],
+                    num_bytes=file_info["num_bytes"],
+                    hash=file_info["hash"],
+                )
+                files.append(entry)
+        except BaseException:
+            for file_path in written:
+                with suppress(FileNotFoundError):
+                    self.storage.remove(file_path)
+            raise
+
+        stale = []
+        if mode == "upsert":
+            touched = {f.get("partition_dir") for f in files if f["batch"] == batch}
+            stale = [
+                f["path"]
+                for f in files
+                if f["batch"] != batch and f.get("partition_dir") in touched
+            ]
+            files = [f for f in files if f["path"] not in stale]
+        if not files:
+            return None, stale
+
+        new_files = [f for f in files if f["batch"] == batch]
+        self._record(
+            "write",
+            mode,
+            started,
+            path=dataset_path,
+            nbytes=sum(f["num_bytes"] for f in new_files),
+            rows=sum(f["num_rows"] for f in new_files),
+        )
+        return {
+            "path": dataset_path,
+            "partition_by": column,
+            "schema": schema,
+            "columns": {name: {"type": dtype} for name, dtype in schema},
+            "files": files,
+            "num_rows": sum(f["num_rows"] for f in files),
+            "num_bytes": sum(f["num_bytes"] for f in files),
+            "write_policy": policy.name,
+        }, stale
+
+    def read_data_cache(self, **kwargs) -> list[pd.DataFrame]:
+        """
+        Читает узел, с кэшированием при необходимости.
+
+        :raises CacheMissError: если узел вытеснили или удалили после загрузки метаданных.
+        """
+        logger.debug(
+            "Loading data for project_id: %s, node_id: %s",
+            self.project_id,
+            self.node_id,
+        )
+
+        self.touch_access()
+        with self._span("node_cache.read_data_cache"):
+            try:
+                data = self.load_data_list(
+                    data_list=self.metadata_store,
+                    remote_keys=self._remote_keys,
+                    **kwargs,
+                )
+            except RuntimeError as err:
+                # снимок, на который указывали метаданные, уже заменён другим писателем
+                # и удалён — переключаемся на опубликованный манифест и читаем ещё раз
+                if not self._reload_if_superseded(err):
+                    raise
+                data = self.load_data_list(
+                    data_list=self.metadata_store,
+                    remote_keys=self._remote_keys,
+                    **kwargs,
+                )
+
+        logger.debug(
+            "Data loaded for project_id: %s, node_id: %s",
+            self.project_id,
+            self.node_id,
+        )
+
+        return data
+
+    def _reload_if_superseded(self, err: RuntimeError) -> bool:
+        """
+        True, если файлы пропали из-за новой записи узла и метаданные переключены на неё.
+
+        :raises CacheMissError: если манифеста узла больше нет.
+        """
+        cause = err.__cause__
+        if not isinstance(cause, CacheArtifactError) or not all(
+            isinstance(error, FileNotFoundError) for error in cause.errors.values()
+        ):
+            return False
+        generation = getattr(self, "generation", 0)  # объекты из pickle до снимков
+        try:
+            self.reload()
+        except FileNotFoundError:
+            # манифеста нет: узел вытеснили или удалили — это промах кэша, а не поломка
+            raise CacheMissError(self.path) from err
+        except ValueError:
+            return False
+        return self.generation != generation
+
+    def touch_access(self) -> None:
+        """Обновляет отметку последнего чтения узла (не чаще ACCESS_TOUCH_INTERVAL)"""
+        now = time.monotonic()
+        if not self.path or now - self._last_touch < self.ACCESS_TOUCH_INTERVAL:
+            return
+        self._last_touch = now
+        with suppress(OSError):  # узел могли вытеснить — чтение само сообщит об ошибке
+            self.storage.touch(f"{self.path}/{self.ACCESS_MARKER}")
+
+    def load_data_list(
+        self,
+        data_list: list,
+        remote_keys: Optional[Iterable[str]] = None,
+        columns: Optional[list[str]] = None,
+        cols_mapping=None,
+        with_values: bool = True,
+        lazy_read: bool = False,
+        read_format: str = "pandas",
+        filters: Optional[Filters] = None,
+        **kwargs,
+    ) -> list[pd.DataFrame]:
+        """
+        Загружает таблицы узла по метаданным.
+
+        ``lazy_read`` переключает на частичное чтение через Polars. Для полного чтения
+        ``read_format`` задаёт представление: ``"pandas"`` (numpy-блоки, по умолчанию),
+        ``"arrow"`` (``pyarrow.Table``) или ``"pandas_arrow"`` (pandas поверх
+        ``pd.ArrowDtype``). Arrow-представления экономят только конвертацию в numpy и
+        предназначены только для чтения.
+
+        ``filters`` — Polars-выражение или список ``[(col, op, value)]``; фильтр
+        проталкивается в чтение parquet, и row group'ы, отсечённые по min/max
+        статистикам, не декодируются.
+        """
+        if read_format not in self.READ_FORMATS:
+            raise ValueError(
+                f"Unknown read_format {read_format!r}, expected one of {self.READ_FORMATS}"
+            )
+        if filters is not None:
+            validate_filters(filters)  # неверный фильтр — ошибка запроса, а не кэша
+        cols_mapping, result_list = cols_mapping or {}, []
+        # set-индекс: проверка ключа за O(1) и для списков из старых манифестов
+        remote_keys = frozenset(remote_keys or ())
+
+        # сначала читаем все таблицы (возможно, параллельно), затем в исходном порядке
+        # собираем результат — маппинг колонок зависит от порядка ключей
+        tasks = [
+            (
+                (el["name"], df_key),
+                (path, columns, with_values, lazy_read, read_format, filters, kwargs),
+            )
+            for el in data_list
+            for df_key, path in el["data"].items()
+            if df_key not in remote_keys
+        ]
+        try:
+            loaded = iter(self._map_artifacts(self._load_artifact, tasks))
+        except CacheArtifactError as err:
+            # неверные колонки — ошибка запроса, а не сломанного кэша
+            errors = list(err.errors.values())
+            if all(isinstance(error, UnknownColumnsError) for error in errors):
+                raise errors[0] from err
+            raise RuntimeError(BROKEN_CACHE_MESSAGE) from err
+
+        for el in data_list:
+            data_el = {"name": el["name"], "data": {}}
+            # нормализованные ключи считаются при сохранении (index_load_keys)
+            load_keys = el.get("load_keys") or {}
+            for df_key, path in el["data"].items():
+                # удаленные данные, ничего из кэша не достаем, просто берем path
+                if df_key in remote_keys:
+                    data_el["data"][df_key] = path
+                else:
+                    data = next(loaded)
+
+                    key = load_keys.get(df_key) or normalize_key(df_key)
+                    if key in cols_mapping:  # proba
+                        key = normalize_key(cols_mapping.pop(key))
+                    else:
+                        data = rename_columns(data, cols_mapping)
+
+                    data_el["data"][key] = data
+
+            result_list.append(data_el)
+
+        self.lazy_read = False
+
+        return result_list
+
+    def _load_artifact(
+        self,
+        path: str,
+        columns: Optional[list[str]],
+        with_values: bool,
+        lazy_read: bool,
+        read_format: str,
+        filters: Optional[Filters],
+        kwargs: dict,
+    ):
+        if not lazy_read and not with_values:  # нам не всегда нужны значения
+            return pd.DataFrame()
+
+        started = time.perf_counter()
+        mode = "lazy" if lazy_read else read_format
+        with self._span("node_cache.read", path=path, mode=mode):
+            data, hit = self._read_artifact(
+                path, columns, lazy_read, read_format, filters, kwargs
+            )
+        if self.metrics is not None:
+            self._record(
+                "read",
+                mode,
+                started,
+                path=path,
+                nbytes=self.artifacts.get(path, {}).get("num_bytes")
+                or self.storage.signature(path)[1],
+                rows=count_rows(data),
+            )
+            if hit is not None:
+                self._record(
+                    "memory_tier", "hit" if hit else "miss", started, path=path
+                )
+        return data
+
+    def _read_artifact(
+        self,
+        path: str,
+        columns: Optional[list[str]],
+        lazy_read: bool,
+        read_format: str,
+        filters: Optional[Filters],
+        kwargs: dict,
+    ) -> tuple[Any, Optional[bool]]:
+        """Читает таблицу (через memory tier, если он включён); второй элемент — попадание в tier"""
+        info = self.artifacts.get(path)
+        if info is not None and "files" in info:
+            data = self._read_dataset(
+                info, columns, lazy_read, read_format, filters, kwargs
+            )
+            return data, None
+
+        tier_key = None
+        if self.memory_tier is not None and filters is None:
+            tier_key = (
+                path,
+                *self.storage.signature(path),
+                lazy_read,
+                None if lazy_read else read_format,
+                tuple(columns) if lazy_read and columns is not None else None,
+                tuple(sorted(kwargs.items())) if lazy_read else (),
+            )
+            try:
+                cached = self.memory_tier.get(tier_key)
+            except TypeError:  # нехэшируемые параметры чтения — читаем мимо кэша
+                tier_key, cached = None, None
+            if cached is not None:
+                return shallow_copy(cached), True
+
+        if lazy_read:
+            data = self.load_df_parquet_lazy(
+                path=path, columns=columns, filters=filters, **kwargs
+            )
+        elif read_format == "pandas":
+            data = self.load_df_parquet(
+                path, filters=filters, prefix=kwargs.get("prefix") or ""
+            )
+        else:
+            data = self.load_df_arrow(
+                path,
+                as_pandas=read_format == "pandas_arrow",
+                filters=filters,
+                prefix=kwargs.get("prefix") or "",
+            )
+
+        if tier_key is not None:
+            self.memory_tier.put(tier_key, data)
+            return shallow_copy(data), False
+        return data, None
+
+    def _read_dataset(
+        self,
+        info: dict,
+        columns: Optional[list[str]],
+        lazy_read: bool,
+        read_format: str,
+        filters: Optional[Filters],
+        kwargs: dict,
+    ):
+        """Читает датасет ключа (append_node), открывая только подходящие под фильтр партиции"""
+        # если отсеяны все партиции, читаем одну с тем же фильтром — получаем пустую таблицу со схемой
+        files = (
+            prune_partitions(info["files"], info.get("partition_by"), filters)
+            or info["files"][:1]
+        )
+        if lazy_read:
+            return self._read_dataset_lazy(files, columns, filters, **kwargs)
+
+        prefix = kwargs.get("prefix") or ""
+        if read_format == "pandas":
+            parts = [
+                self.load_df_parquet(f["path"], filters=filters, prefix=prefix)
+                for f in files
+            ]
+            return pd.concat(parts, ignore_index=True)
+        parts = [
+            self.load_df_arrow(f["path"], filters=filters, prefix=prefix) for f in files
+        ]
+        table = pa.concat_tables(parts)
+        if read_format == "pandas_arrow":
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        return table
+
+    def _read_dataset_lazy(
+        self,
+        files: list[dict],
+        columns: Optional[list[str]],
+        filters: Optional[Filters],
+        row_start: int = 0,
+        row_length: Optional[int] = None,
+        **kwargs,
+    ) -> pl_DataFrame:
+        if (
+            filters is not None
+        ):  # сколько строк останется после фильтра, заранее неизвестно
+            frames = [
+                self.load_df_parquet_lazy(f["path"], columns, filters=filters, **kwargs)
+                for f in files
+            ]
+            return pl.concat(frames, how="vertical_relaxed").slice(
+                max(0, row_start), row_length
+            )
+
+        # файлы целиком до row_start пропускаем по числу строк из манифеста
+        frames, row_start = [], max(0, row_start)
+        for f in files:
+            if row_length is not None and row_length <= 0:
+                break
+            if row_start >= f["num_rows"]:
+                row_start -= f["num_rows"]
+                continue
+            frame = self.load_df_parquet_lazy(
+                f["path"], columns, row_start, row_length, **kwargs
+            )
+            frames.append(frame)
+            row_start = 0
+            if row_length is not None:
+                row_length -= frame.height
+        if not frames:
+            return self.load_df_parquet_lazy(files[0]["path"], columns, 0, 0, **kwargs)
+        return pl.concat(frames, how="vertical_relaxed")
+
+    def artifact_info(self, path: str) -> Optional[dict]:
+        """
+        Описание артефакта из манифеста по пути в метаданных: обычный файл, blob (dedup)
+        или файл внутри датасета append_node.
+        """
+        if (info := self.artifacts.get(path)) is not None:
+            return info
+        # индекс по фактическим путям перестраивается, только если путь в нём не нашёлся
+        # или устарел, — загрузка узла из n таблиц не сканирует artifacts n раз
+        for rebuild in (False, True):
+            if rebuild:
+                self._artifact_index = {
+                    info["path"]: key for key, info in self.artifacts.items()
+                }
+            # файл датасета append_node ищем по папкам-предкам: {key}/{col}={value}/...
+            candidate = path
+            while candidate:
+                key = self._artifact_index.get(candidate)
+                info = self.artifacts.get(key) if key is not None else None
+                if info is not None and info["path"] == candidate:
+                    if candidate == path or "files" in info:
+                        return info
+                candidate = candidate.rpartition("/")[0]
+        return None
+
+    def column_names(self, path: str) -> Optional[dict]:
+        """Индекс колонок таблицы из манифеста; None для узлов, сохранённых до индекса"""
+        info = self.artifact_info(path)
+        return None if info is None else info.get("columns")
 
-                    data_path = f"{path}/{df_key_clean}.parquet"
-                    self.save_df_to_parquet(data, data_path)
-                    el["data"][df_key_clean] = data_path
-                else:
-                    # Если пришёл polars.DataFrame, то это значит, что данные годятся только для просмотра - их сохранять не надо
-                    warnings.warn(
-                        "Предпринята попытка сохранить неполные данные кэша. "
-                        "Пожалуйста, избегайте сохранения неполных экземпляров",
-                        UserWarning,
-                    )
+    def column_index(self, key: str, name: Optional[str] = None) -> dict[str, dict]:
+        """
+        Физические колонки таблицы узла с типом и размером — без открытия parquet-файла.
 
-            result_list.append(el)
+        :return: ``{column: {"type": ..., "nbytes": ..., "raw_nbytes": ...}}``; размеры
+            (сжатый и несжатый) есть только у таблиц, сохранённых одним файлом.
+        """
+        path = self.artifact_path(key, name=name)
+        if (columns := self.column_names(path)) is not None:
+            return columns
+        with self._open_input(path) as source:  # узел сохранён до индекса колонок
+            return describe_columns(pq.read_metadata(source))
 
-        return result_list
+    def preview(
+        self, key: str, name: Optional[str] = None, rows: Optional[int] = None
+    ) -> pl_DataFrame:
+        """
+        Первые ``rows`` строк таблицы узла для просмотра.
 
-    def save_df_to_parquet(self, df: pd.DataFrame | bytes, data_path: str):
-        if isinstance(df, bytes):
-            df = pickle.loads(df)
-        if isinstance(df, pd.DataFrame):
-            df.to_parquet(data_path, index=False, storage_options=self.storage_options)
+        Превью, сохранённое при записи (``profile=True``), читается из маленького
+        файла рядом с таблицей, если оно не короче ``rows``; иначе читаются только
+        первые row group'ы самой таблицы.
+        """
+        rows = self.PREVIEW_ROWS if rows is None else rows
+        path = self.artifact_path(key, name=name)
+        info = self.artifact_info(path) or {}
+        if (profile := info.get("profile")) is not None and rows <= self.PREVIEW_ROWS:
+            with self._open_input(profile["preview"]) as source:
+                return pl.read_parquet(source, n_rows=rows)
+        if "files" in info:
+            return self._read_dataset_lazy(info["files"], None, None, row_length=rows)
+        return self.load_df_parquet_lazy(path, row_length=rows)
 
-    def read_data_cache(self, **kwargs) -> list[pd.DataFrame]:
-        """Читает узел, с кэшированием при необходимости"""
-        logger.info(
-            "Loading data for project_id: %s, node_id: %s",
-            self.project_id,
-            self.node_id,
-        )
+    def column_stats(self, key: str, name: Optional[str] = None) -> dict:
+        """
+        Статистика таблицы узла: ``{"num_rows": ..., "columns": {column: stats}}``.
 
-        data = self.load_data_list(
-            data_list=self.metadata_store, remote_keys=self._remote_keys, **kwargs
-        )
+        ``stats`` — ``type``, ``count``, ``nulls``, ``min``, ``max``, а для строковых,
+        категориальных и логических колонок ещё ``distinct`` и ``top`` (``[[value, count]]``).
+        Без сохранённой статистики (``profile=False``) она собирается из футера parquet
+        — без чтения данных, но без частых значений.
+        """
+        path = self.artifact_path(key, name=name)
+        info = self.artifact_info(path) or {}
+        if (profile := info.get("profile")) is not None:
+            return json.loads(self.storage.read_bytes(profile["stats"]))
+        if "files" in info:
+            raise ValueError(f"Key {key!r} is an append dataset without profile")
+        with self._open_input(path) as source:
+            return parquet_profile(pq.read_metadata(source))
 
-        logger.info(
-            "Data loaded for project_id: %s, node_id: %s",
-            self.project_id,
-            self.node_id,
-        )
+    def artifact_path(self, key: str, name: Optional[str] = None) -> str:
+        """
+        Путь к parquet-файлу таблицы узла по ключу.
 
-        return data
+        Ключ принимается как в метаданных (``a_b``), так и в виде, который возвращает
+        ``read_data_cache`` (``a:b``). ``name`` ограничивает поиск одним элементом.
+        """
+        for el in self.metadata_store:
+            if name is not None and el["name"] != name:
+                continue
+            for df_key, path in el["data"].items():
+                if key in (df_key, df_key.replace("_", ":")):
+                    if df_key in self._remote_keys:
+                        raise ValueError(f"Key {key!r} is a remote reference: {path}")
+                    return path
+        raise KeyError(f"Key {key!r} not found in cache of node {self.node_id}")
 
-    def load_data_list(
+    def iter_batches(
         self,
-        data_list: list,
-        remote_keys: list = None,
+        key: str,
         columns: Optional[list[str]] = None,
-        cols_mapping=None,
-        with_values: bool = True,
-        lazy_read: bool = False,
-        **kwargs,
-    ) -> list[pd.DataFrame]:
-        cols_mapping, result_list = cols_mapping or {}, []
-        for el in data_list:
-            data_el = {"name": el["name"], "data": {}}
-            for df_key, path in el["data"].items():
-                if (
-                    remote_keys is not None and df_key in remote_keys
-                ):  # удаленные данные, ничего из кэша не достаем, просто берем path
-                    data_el["data"][df_key] = path
-                else:
-                    if lazy_read:
-                        data = self.load_df_parquet_lazy(
-                            path=path, columns=columns, **kwargs
-                        )
-                    else:
-                        try:
-                            data = (
-                                self.load_df_parquet(path)
-                                if with_values
-                                else pd.DataFrame()
-                            )  # нам не всегда нужны значения
-                        except Exception as err:
-                            raise RuntimeError(
-                                "Вы поймали самую редкую ошибку в SMILE, Поздравляю вас. Этот граф скорее всего сломан, либо перезагрузите граф, либо создайте новый. Мы уже работаем над этим, простите за неудобства!"
-                            ) from err
-
-                    if (key := df_key.replace("_", ":")) in cols_mapping:  # proba
-                        df_key = cols_mapping.pop(key)
-                    elif isinstance(data, pd.DataFrame):
-                        data = data.rename(columns=cols_mapping)
-
-                    data_el["data"][df_key.replace("_", ":")] = data
+        batch_size: int = 65_536,
+        as_pandas: bool = False,
+        name: Optional[str] = None,
+        prefix: str = "",
+    ) -> Iterator[pa.RecordBatch | pd.DataFrame]:
+        """
+        Потоково отдаёт таблицу узла порциями по ``batch_size`` строк.
 
-            result_list.append(data_el)
+        В памяти одновременно находится только текущий row group, поэтому агрегации и
+        выгрузки по большим выходам узла работают с постоянным потреблением памяти.
+        Колонки ищутся так же, как в ``load_df_parquet_lazy``: по индексу колонок
+        из манифеста, под «чистыми» или «грязными» (``hash_columns_list``) именами.
 
-        self.lazy_read = False
+        :param key: ключ таблицы в метаданных узла.
+        :param columns: колонки для чтения, по умолчанию все.
+        :param batch_size: максимальное число строк в порции.
+        :param as_pandas: отдавать ``pd.DataFrame`` вместо ``pa.RecordBatch``.
+        :param name: имя элемента, если ключ встречается в нескольких.
+        :param prefix: префикс для конвертации названий колонок.
+        """
+        self.touch_access()
+        path, started, rows = self.artifact_path(key, name=name), time.perf_counter(), 0
+        info = self.artifact_info(path) or {}
+        # датасет (append_node) отдаётся файл за файлом в порядке записи
+        file_paths = [f["path"] for f in info["files"]] if "files" in info else [path]
+        for file_path in file_paths:
+            with self._open_input(file_path) as source:
+                parquet_file = pq.ParquetFile(source)
+                read_columns = columns
+                if columns is not None:
+                    read_columns = resolve_columns(
+                        columns,
+                        info.get("columns") or parquet_file.schema_arrow.names,
+                        prefix,
+                        file_path,
+                    )
 
-        return result_list
+                for batch in parquet_file.iter_batches(
+                    batch_size=batch_size, columns=read_columns
+                ):
+                    rows += batch.num_rows
+                    yield batch.to_pandas() if as_pandas else batch
+        self._record("read", "batches", started, path=path, rows=rows)
+
+    def _resolve_filters(
+        self, data_path: str, filters: Optional[Filters], prefix: str = ""
+    ) -> Optional[Filters]:
+        """Фильтр с физическими именами колонок из индекса манифеста (или схемы файла)"""
+        if filters is None:
+            return None
+        names = self.column_names(data_path)
+        if names is None:  # узел сохранён до индекса колонок
+            with self._open_input(data_path) as source:
+                names = pq.read_schema(source).names
+        return resolve_filters(filters, names, prefix, data_path)
 
     def load_df_parquet(
         self,
         data_path: str,
+        filters: Optional[Filters] = None,
+        prefix: str = "",
     ) -> pd.DataFrame:
-        return pd.read_parquet(data_path, storage_options=self.storage_options)
+        filters = self._resolve_filters(data_path, filters, prefix)
+        with self._open_input(data_path) as source:
+            if isinstance(filters, pl.Expr):
+                return pl.scan_parquet(source).filter(filters).collect().to_pandas()
+            return pd.read_parquet(source, filters=filters)
+
+    def load_df_arrow(
+        self,
+        data_path: str,
+        as_pandas: bool = False,
+        filters: Optional[Filters] = None,
+        prefix: str = "",
+    ) -> pa.Table | pd.DataFrame:
+        """
+        Читает parquet в ``pyarrow.Table``.
+
+        Parquet всегда декодируется в собственные буферы Arrow процесса, поэтому память
+        между читателями не разделяется. Выигрыш по сравнению с ``"pandas"`` только в том,
+        что таблица не перекладывается в numpy-блоки: при ``as_pandas=True`` колонки
+        оборачиваются в ``pd.ArrowDtype``. Разделяемые страницы даёт ``attach`` поверх
+        Arrow IPC из ``publish_node``.
+        """
+        filters = self._resolve_filters(data_path, filters, prefix)
+        with self._open_input(data_path) as source:
+            if isinstance(filters, pl.Expr):
+                table = pl.scan_parquet(source).filter(filters).collect().to_arrow()
+            else:
+                table = pq.read_table(source, memory_map=True, filters=filters)
+        if as_pandas:
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        return table
 
     def load_df_parquet_lazy(
         self,
@@ -188,6 +2445,7 @@ class CacheManager:
         row_start: int = 0,
         row_length: int | None = None,
         prefix: str = "",
+        filters: Optional[Filters] = None,
         **kwargs,
     ) -> "pl_DataFrame":
         """
@@ -204,14 +2462,21 @@ class CacheManager:
             Путь к Parquet-файлу.
         columns : list | None, optional
             Список столбцов для загрузки. Если None (по умолчанию),
-            загружаются все столбцы.
+            загружаются все столбцы. Имена ищутся в индексе колонок из манифеста
+            («чистые» или «грязные»); неизвестные колонки — ``UnknownColumnsError``.
         row_start : int, default 0
-            Смещение от начала файла — с какой строки начинать чтение.
+            Смещение от начала файла — с какой строки начинать чтение. Читаются только
+            row group'ы, покрывающие диапазон (по числу строк из футера parquet).
         row_length : int | None, optional
             Количество строк для чтения. Если None (по умолчанию), читаются все строки
             начиная с `row_start`.
         prefix: str | None, optional
            префикс для конвертации названий колонок
+        filters : pl.Expr | list[tuple] | None, optional
+            Фильтр строк: Polars-выражение или ``[(col, op, value)]`` с операторами
+            ``==, !=, <, <=, >, >=, in, not in``. Выполняется через ``pl.scan_parquet``
+            с проталкиванием предиката; ``row_start``/``row_length`` применяются
+            к уже отфильтрованным строкам.
         **kwargs : dict
             Дополнительные параметры, передаваемые в Polars (например, для кастомизации чтения).
 
@@ -226,6 +2491,8 @@ class CacheManager:
         потребление памяти.
         - Ограничение по строкам (`row_start` и `row_length`) полезно для постраничной
         выборки или при работе с большими файлами.
+        - Время чтения страницы не зависит от `row_start`: строки до нужного
+        row group не декодируются.
         - Для очень больших датасетов можно использовать `pl.scan_parquet(path)`,
         чтобы работать в ленивом режиме без загрузки всего файла в память.
 
@@ -239,39 +2506,89 @@ class CacheManager:
 
         >>> # Прочитать только столбцы "id" и "value"
         >>> df = self.load_df_parquet_lazy("data.parquet", columns=["id", "value"])
-        """
 
-        if columns is None:
-            return pl.read_parquet(path, n_rows=row_length, row_index_offset=row_start)
+        >>> # Прочитать строки, где value > 10
+        >>> df = self.load_df_parquet_lazy("data.parquet", filters=[("value", ">", 10)])
+        """
+        # индекс колонок из манифеста: проекция — один поиск, без перебора попыток чтения
+        names = self.column_names(path)
+        with self._open_input(path) as source:
+            if filters is not None:
+                return self._scan_parquet_filtered(
+                    source, columns, row_start, row_length, prefix, filters, names
+                )
 
-        # Пробуем доставать как по "чистым" фичам, так и по "грязным"
-        for cols in [columns, hash_columns_list(columns, prefix)]:
-            try:
-                return pl.read_parquet(
-                    path, columns=cols, n_rows=row_length, row_index_offset=row_start
+            parquet_file = pq.ParquetFile(source)
+            if columns is not None:
+                # узлы, сохранённые до индекса, — имена из уже прочитанного футера
+                columns = resolve_columns(
+                    columns, names or parquet_file.schema_arrow.names, prefix, path
                 )
-            except (ColumnNotFoundError, ArrowInvalid):
-                continue
+            return read_parquet_rows(parquet_file, columns, row_start, row_length)
+
+    @staticmethod
+    def _scan_parquet_filtered(
+        source,
+        columns: list | None,
+        row_start: int,
+        row_length: int | None,
+        prefix: str,
+        filters: Filters,
+        names: Optional[Iterable[str]] = None,
+    ) -> pl_DataFrame:
+        lazy_frame = pl.scan_parquet(source)
+        names = set(names or lazy_frame.collect_schema().names())
+        # фильтр применяется до select — так он может ссылаться на любые колонки файла
+        filters = resolve_filters(filters, names, prefix, str(source))
+        lazy_frame = lazy_frame.filter(filters_to_expr(filters))
+
+        if columns is not None:
+            lazy_frame = lazy_frame.select(
+                resolve_columns(columns, names, prefix, str(source))
+            )
 
-        # если колонки не найдены ни одним из способов, то читаем все
-        return pl.read_parquet(path, n_rows=row_length, row_index_offset=row_start)
+        return lazy_frame.slice(max(0, row_start), row_length).collect()
 
     @property
     def is_empty(self):
-        return not os.path.isdir(self.path)
+        return not self.path or not self.storage.isdir(self.path)
 
     @staticmethod
-    def delete_project_cache(project_id: str | int) -> None:
+    def delete_project_cache(
+        project_id: str | int,
+        storage_root: str = "",
+        cache_dir: str = "CACHE_test",
+        nodes_dir: str = "nodes",
+        storage_options: Optional[dict] = None,
+    ) -> None:
         """
         Delete all cached files for a given project ID from the filesystem.
 
         :param project_id: Identifier of the project whose cache (nodes) should be deleted.
+        :param storage_root: Storage root the cache was created with (local CACHE_ROOT by default).
+        :param cache_dir: Cache directory under ``storage_root``.
+        :param nodes_dir: Nodes directory under ``cache_dir``.
+        :param storage_options: fsspec options for remote storage.
         """
         logger.info("Deleting project cache for project_id: %s", project_id)
-        node_path = Path(f"{CacheManager.CACHE_ROOT}/{project_id}")
+        storage = make_storage(storage_root, storage_options)
+        root = CacheManager.cache_root(storage_root, cache_dir, nodes_dir)
+        node_path = f"{root}/{project_id}"
+
+        if CacheManager.memory_tier is not None:
+            CacheManager.memory_tier.invalidate(node_path)
 
-        if node_path.exists() and node_path.is_dir():
-            shutil.rmtree(node_path)
+        if storage.isdir(node_path):
+            # blob'ы удаляются, только когда на них не осталось ссылок из других узлов
+            manifests = storage.glob(f"{node_path}/*/{CacheManager.MANIFEST_NAME}")
+            for manifest_path in manifests:
+                release_node_refs(
+                    storage, manifest_path.rsplit("/", 1)[0], CacheManager.MANIFEST_NAME
+                )
+            storage.rmtree(node_path)
+            # ссылки записей, которые упали до манифеста
+            if storage.is_local:
+                collect_orphan_refs(CacheManager.OBJECTS_ROOT)
             logger.info("Cache deleted: %s", node_path)
         else:
             logger.info("Path not found. Failed to delete: %s", node_path)
@@ -281,5 +2598,886 @@ class CacheManager:
         """
         Стирает всю мету
         """
+        if self.memory_tier is not None and self.path:
+            self.memory_tier.invalidate(self.path)
+
         self.metadata_store = []
         self._remote_keys.clear()
+        self.artifacts = {}
+
+
+@dataclass
+class NodeUsage:
+    """Занимаемое узлом место и данные для выбора кандидатов на вытеснение"""
+
+    project_id: str
+    node_id: str
+    path: str
+    nbytes: int
+    last_access: float
+    recompute_cost: Optional[float] = None
+
+    def eviction_score(self, now: float) -> float:
+        """Чем меньше, тем выгоднее вытеснить: дешёвый пересчёт, много байт, давно не читали"""
+        cost_per_byte = (self.recompute_cost or 0.0) / max(self.nbytes, 1)
+        idle_hours = max(now - self.last_access, 0.0) / 3600
+        return cost_per_byte / (1.0 + idle_hours)
+
+
+class CacheQuotaManager:
+    """
+    Квота на весь кэш узлов: учёт байт по проектам и узлам, вытеснение узлов
+    по LRU (``policy="lru"``) или по соотношению цена пересчёта/размер (``"cost"``).
+
+    Размер узла — байты файлов в его папке (все снимки, превью, handoff) плюс blob'ы,
+    на которые ссылается только он; общие blob'ы считаются один раз. Время последнего
+    доступа — из отметки ``ACCESS_MARKER``. Узлы, которые читались последние
+    ``min_idle`` секунд, не вытесняются. Вытесняемый узел сначала переименовывается
+    (на локальной ФС — атомарно; на объектных хранилищах переименование — это
+    копирование и удаление объектов), поэтому читатели получают ``CacheMissError``
+    (FileNotFoundError) и пересчитывают узел, а уже открытые файлы дочитываются.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        storage_root: str = "",
+        cache_dir: str = "CACHE_test",
+        nodes_dir: str = "nodes",
+        storage_options: Optional[dict] = None,
+        policy: str = "lru",
+        low_watermark: float = 0.9,  # после вытеснения занято не больше max_bytes * low_watermark
+        min_idle: float = 300.0,
+    ):
+        if policy not in ("lru", "cost"):
+            raise ValueError(
+                f"Unknown eviction policy {policy!r}, expected 'lru' or 'cost'"
+            )
+        self.max_bytes = max_bytes
+        self.storage = make_storage(storage_root, storage_options)
+        self.root = CacheManager.cache_root(storage_root, cache_dir, nodes_dir)
+        self.policy = policy
+        self.low_watermark = low_watermark
+        self.min_idle = min_idle
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def scan(self) -> list[NodeUsage]:
+        """Все узлы кэша с размером, временем последнего доступа и ценой пересчёта"""
+        return self._scan()[0]
+
+    def _scan(self) -> tuple[list[NodeUsage], int]:
+        """
+        Узлы кэша и байты общих blob'ов (dedup), на которые ссылается больше одного узла.
+
+        Размер узла — всё, что освободится при его вытеснении: файлы в папке узла
+        (все хранимые снимки, превью, handoff) и blob'ы, на которые ссылается только он.
+        Общие blob'ы учитываются один раз и ни одному узлу не приписываются.
+        """
+        usage, shared = [], {}
+        for manifest_path in self.storage.glob(
+            f"{self.root}/*/*/{CacheManager.MANIFEST_NAME}"
+        ):
+            node_path = manifest_path.rsplit("/", 1)[0]
+            try:
+                manifest = json.loads(self.storage.read_bytes(manifest_path))
+                last_access = self.storage.modified(manifest_path)
+                with suppress(FileNotFoundError):
+                    marker = f"{node_path}/{CacheManager.ACCESS_MARKER}"
+                    last_access = max(last_access, self.storage.modified(marker))
+                nbytes = self.storage.du(node_path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # узел удалили или записывают прямо сейчас
+
+            own_blobs = {}
+            for info in manifest.get("artifacts", {}).values():
+                if not info.get("ref"):
+                    continue
+                if blob_owned_by(info["ref"], node_path):
+                    own_blobs[info["path"]] = info.get("num_bytes", 0)
+                else:
+                    shared[info["path"]] = info.get("num_bytes", 0)
+
+            project_id, node_id = node_path.rsplit("/", 2)[-2:]
+            usage.append(
+                NodeUsage(
+                    project_id=project_id,
+                    node_id=node_id,
+                    path=node_path,
+                    nbytes=nbytes + sum(own_blobs.values()),
+                    last_access=last_access,
+                    recompute_cost=manifest.get("recompute_cost"),
+                )
+            )
+        return usage, sum(shared.values())
+
+    def report(self) -> dict:
+        """Занятое место: всего, по проектам и по узлам (общие blob'ы — отдельно)"""
+        usage, shared_nbytes = self._scan()
+        projects: dict[str, dict] = {}
+        for node in usage:
+            project = projects.setdefault(node.project_id, {"nbytes": 0, "nodes": {}})
+            project["nbytes"] += node.nbytes
+            project["nodes"][node.node_id] = asdict(node)
+        return {
+            "nbytes": sum(node.nbytes for node in usage) + shared_nbytes,
+            "shared_nbytes": shared_nbytes,
+            "max_bytes": self.max_bytes,
+            "projects": projects,
+        }
+
+    def plan(self) -> list[NodeUsage]:
+        """Узлы, которые нужно вытеснить, чтобы уложиться в квоту"""
+        usage, shared_nbytes = self._scan()
+        total = sum(node.nbytes for node in usage) + shared_nbytes
+        if total <= self.max_bytes:
+            return []
+
+        now = time.time()
+        candidates = [node for node in usage if now - node.last_access >= self.min_idle]
+        if self.policy == "lru":
+            candidates.sort(key=lambda node: node.last_access)
+        else:
+            candidates.sort(
+                key=lambda node: (node.eviction_score(now), node.last_access)
+            )
+
+        target, victims = self.max_bytes * self.low_watermark, []
+        for node in candidates:
+            if total <= target:
+                break
+            victims.append(node)
+            total -= node.nbytes
+        return victims
+
+    def sweep(self, dry_run: bool = False) -> dict:
+        """
+        Вытесняет узлы сверх квоты. В режиме ``dry_run`` только возвращает отчёт
+        о том, что было бы вытеснено.
+        """
+        victims = self.plan()
+        evicted = []
+        for node in victims:
+            if dry_run or self.evict_node(node):
+                evicted.append(asdict(node))
+        if not dry_run and self.storage.is_local:
+            collect_orphan_refs(CacheManager.OBJECTS_ROOT)
+
+        freed = sum(node["nbytes"] for node in evicted)
+        logger.info(
+            "Cache sweep%s: %d nodes, %d bytes",
+            " (dry run)" if dry_run else "",
+            len(evicted),
+            freed,
+        )
+        return {"dry_run": dry_run, "evicted": evicted, "freed_bytes": freed}
+
+    def evict_node(self, node: NodeUsage) -> bool:
+        """
+        Убирает узел из кэша переименованием (атомарным только на локальной ФС); False,
+        если узел уже удалён, переименован другим или его прямо сейчас записывают
+        (блокировка узла занята).
+        """
+        if not self.storage.isdir(node.path):
+            return False
+        tombstone = (
+            f"{node.path.rsplit('/', 1)[0]}/.evicted-{node.node_id}-{uuid.uuid4().hex}"
+        )
+        try:
+            # писатель узла не ждёт вытеснения, а вытеснение — писателя: занятый узел пропускаем
+            with self.storage.lock(
+                f"{node.path}/{CacheManager.LOCK_NAME}", 0.0, CacheManager.LEASE_TTL
+            ):
+                self.storage.rename(node.path, tombstone)
+        except (TimeoutError, FileNotFoundError, OSError):
+            return False
+
+        if CacheManager.memory_tier is not None:
+            CacheManager.memory_tier.invalidate(node.path)
+        release_node_refs(self.storage, tombstone, CacheManager.MANIFEST_NAME)
+        self.storage.rmtree(tombstone)
+        return True
+
+    def start(self, interval: float = 600.0) -> None:
+        """Запускает фоновый поток, который вызывает sweep каждые ``interval`` секунд"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception:
+                    logger.exception("Cache sweep failed")
+
+        self._sweeper = threading.Thread(
+            target=run, name="NodeCacheSweeper", daemon=True
+        )
+        self._sweeper.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+
+def filters_to_expr(filters: Filters) -> pl.Expr:
+    """Приводит фильтр к Polars-выражению; условия ``[(col, op, value)]`` объединяются через И"""
+    if isinstance(filters, pl.Expr):
+        return filters
+
+    validate_filters(filters)
+    predicate = pl.lit(True)
+    for col, op, value in filters:
+        predicate = predicate & FILTER_OPERATORS[op](pl.col(col), value)
+    return predicate
+
+
+def validate_filters(filters: Filters) -> None:
+    """
+    Проверяет форму фильтра до чтения файлов.
+
+    :raises ValueError: если условие не тройка ``(col, op, value)`` или оператор не поддерживается.
+    """
+    if isinstance(filters, pl.Expr):
+        return
+    for condition in filters:
+        if not isinstance(condition, (tuple, list)) or len(condition) != 3:
+            raise ValueError(
+                f"Filter condition must be (column, op, value), got {condition!r}"
+            )
+        if condition[1] not in FILTER_OPERATORS:
+            raise ValueError(
+                f"Unsupported filter operator {condition[1]!r}, "
+                f"expected one of {sorted(FILTER_OPERATORS)}"
+            )
+
+
+def resolve_filters(
+    filters: Filters, names: Iterable[str], prefix: str = "", path: str = ""
+) -> Filters:
+    """
+    Фильтр с физическими именами колонок: «чистое» имя в условии ``(col, op, value)``
+    заменяется «грязным», как в ``resolve_columns``. Колонки Polars-выражения только
+    проверяются — переименовать их внутри выражения нельзя.
+
+    :raises UnknownColumnsError: если колонки фильтра нет в таблице.
+    :raises ValueError: если фильтр неверной формы (``validate_filters``).
+    """
+    validate_filters(filters)
+    names = names if isinstance(names, (set, dict)) else set(names)
+    if isinstance(filters, pl.Expr):
+        missing = [name for name in filters.meta.root_names() if name not in names]
+        if missing:
+            raise UnknownColumnsError(missing, path)
+        return filters
+
+    columns = resolve_columns([col for col, _, _ in filters], names, prefix, path)
+    return [(col, op, value) for col, (_, op, value) in zip(columns, filters)]
+
+
+def normalize_key(df_key: str) -> str:
+    """Ключ таблицы в результате чтения: ``a_b`` в метаданных -> ``a:b``"""
+    return df_key.replace("_", ":")
+
+
+def index_load_keys(el: dict) -> None:
+    """Сохраняет в элементе метаданных нормализованные ключи, чтобы не считать их при каждом чтении"""
+    el["load_keys"] = {df_key: normalize_key(df_key) for df_key in el["data"]}
+
+
+def rename_columns(data, mapping: dict):
+    """
+    Переименовывает колонки без копирования данных: меняются только метаданные таблицы.
+    Таблица только что прочитана (или это поверхностная копия из memory tier),
+    поэтому оси pandas меняются на месте.
+    """
+    if not mapping:
+        return data
+    if isinstance(data, pd.DataFrame):
+        data.columns = [mapping.get(column, column) for column in data.columns]
+    elif isinstance(data, pa.Table):
+        data = data.rename_columns([mapping.get(c, c) for c in data.column_names])
+    return data
+
+
+def partition_value(value) -> Any:
+    """Значение партиции для манифеста (JSON-скаляр) или None, если его нельзя сравнивать"""
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        with suppress(ValueError, TypeError):
+            value = value.item()  # numpy-скаляры
+    if isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float) and math.isfinite(value):
+        return value
+    return None
+
+
+def prune_partitions(
+    files: list[dict], partition_by: Optional[str], filters: Optional[Filters]
+) -> list[dict]:
+    """
+    Файлы датасета, чьи партиции могут пройти фильтр ``[(col, op, value)]``.
+
+    Проверяются только условия на колонку партиционирования и только по значениям
+    из манифеста; файлы без сравнимого значения партиции не отсеиваются.
+    Polars-выражения не разбираются — их отсечение делают статистики parquet.
+    """
+    if partition_by is None or not isinstance(filters, list):
+        return files
+    conditions = [condition for condition in filters if condition[0] == partition_by]
+    known = {
+        f["partition_dir"]: f["partition_value"]
+        for f in files
+        if "partition_value" in f
+    }
+    if not conditions or not known:
+        return files
+
+    try:
+        frame = pl.DataFrame(
+            {"__partition_dir__": list(known), partition_by: list(known.values())},
+            strict=False,
+        )
+        passed = set(
+            frame.filter(filters_to_expr(conditions))["__partition_dir__"].to_list()
+        )
+    except (TypeError, pl.exceptions.PolarsError):  # значения разных типов
+        return files
+    return [
+        f for f in files if f["partition_dir"] in passed or "partition_value" not in f
+    ]
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def count_rows(data) -> int:
+    if isinstance(data, pa.Table):
+        return data.num_rows
+    return len(data) if hasattr(data, "__len__") else 0
+
+
+def is_chunk_stream(data) -> bool:
+    """Итератор/генератор чанков или RecordBatchReader, а не целая таблица"""
+    return isinstance(data, (Iterator, pa.RecordBatchReader))
+
+
+def chunk_to_arrow(chunk) -> pa.Table:
+    if isinstance(chunk, bytes):
+        chunk = pickle.loads(chunk)
+    if isinstance(chunk, pd.DataFrame):
+        return pa.Table.from_pandas(chunk, preserve_index=False)
+    if isinstance(chunk, pa.RecordBatch):
+        return pa.Table.from_batches([chunk])
+    if isinstance(chunk, pa.Table):
+        return chunk
+    raise TypeError(f"Unsupported chunk type for streaming cache write: {type(chunk)}")
+
+
+def read_ipc(path: str) -> pa.Table:
+    """Arrow IPC файл как memory-mapped таблица: буферы ссылаются на страницы файла"""
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def arrow_to_format(table: pa.Table, read_format: str):
+    """Таблица Arrow в представлении ``read_format`` (см. CacheManager.READ_FORMATS)"""
+    if read_format == "pandas_arrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    if read_format == "pandas":
+        return table.to_pandas()
+    return table
+
+
+def shallow_copy(data):
+    """Копия-обёртка над теми же буферами, чтобы читатели не меняли общий экземпляр"""
+    if isinstance(data, pl_DataFrame):
+        return data.clone()
+    if isinstance(data, pd.DataFrame):
+        return data.copy(deep=False)
+    return data  # pyarrow.Table неизменяем
+
+
+def estimate_nbytes(data) -> int:
+    """Оценка размера таблицы в памяти для бюджета MemoryCacheTier"""
+    if isinstance(data, pl_DataFrame):
+        return int(data.estimated_size())
+    if isinstance(data, pd.DataFrame):
+        return int(data.memory_usage(index=True, deep=True).sum())
+    return int(getattr(data, "nbytes", 0))
+
+
+def fingerprint_frame(df: pd.DataFrame) -> str:
+    """
+    Хэш содержимого DataFrame: схема + векторизованный хэш строк без учёта индекса.
+
+    ``hash_pandas_object`` приводит object-колонки к строкам, и ``[1, 2]`` совпал бы
+    с ``["1", "2"]``. Поэтому object-колонки хэшируются через Arrow: выведенные типы
+    и IPC-байты. Колонка, которую Arrow не приводит к одному типу, даёт TypeError
+    или ValueError — такая таблица пишется без fingerprint.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    digest.update(str(len(df)).encode())
+    objects = (df.dtypes == object).to_numpy()
+    if not objects.all():
+        plain = df.iloc[:, ~objects]
+        digest.update(
+            pd.util.hash_pandas_object(plain, index=False).to_numpy().tobytes()
+        )
+    if objects.any():
+        table = pa.Table.from_pandas(df.iloc[:, objects], preserve_index=False)
+        digest.update(
+            repr(list(zip(table.column_names, map(str, table.schema.types)))).encode()
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema.remove_metadata()) as writer:
+            writer.write_table(table.replace_schema_metadata())
+        digest.update(sink.getvalue())
+    return digest.hexdigest()
+
+
+def is_unchanged(
+    previous: Optional[dict], fingerprint: str, policy: WritePolicy
+) -> bool:
+    """Прежний файл таблицы можно переиспользовать: то же содержимое и та же политика записи"""
+    return (
+        previous is not None
+        and previous.get("fingerprint") == fingerprint
+        and previous.get("write_policy") == policy.name
+        and not previous.get("ref")
+        and "files" not in previous
+    )
+
+
+def node_fingerprint(metadata: list, artifacts: dict) -> str:
+    """
+    Fingerprint выхода узла: fingerprint'ы (или хэши файлов) таблиц и ссылки на удалённые
+    данные в порядке метаданных. Подходит как часть cache_key узлов ниже по графу.
+    """
+    fingerprints = {}
+    for data_path, info in artifacts.items():
+        value = info.get("fingerprint") or info.get("hash")
+        if "files" in info:  # датасет append_node
+            value = [f["hash"] for f in info["files"]]
+        # при dedup в метаданных путь blob'а, а ключ artifacts — путь таблицы в узле
+        fingerprints[data_path] = fingerprints[info["path"]] = value
+    digest = hashlib.blake2b(digest_size=16)
+    for el in metadata:
+        for df_key, path in el["data"].items():
+            digest.update(
+                json.dumps([el["name"], df_key, fingerprints.get(path, path)]).encode()
+            )
+    return digest.hexdigest()
+
+
+def read_manifest(storage: StorageBackend, path: str, manifest_name: str) -> dict:
+    """Манифест узла; пустой словарь, если манифеста нет"""
+    try:
+        return json.loads(storage.read_bytes(f"{path}/{manifest_name}"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def read_manifest_artifacts(
+    storage: StorageBackend, path: str, manifest_name: str
+) -> dict:
+    """Артефакты из манифеста узла; пустой словарь, если манифеста нет"""
+    return read_manifest(storage, path, manifest_name).get("artifacts", {})
+
+
+@contextmanager
+def hold_lease(storage: StorageBackend, lease_path: str, timeout: float, ttl: float):
+    """
+    Lease-файл для хранилищ без атомарного «создать, если нет» (S3, GCS).
+
+    Писатель записывает lease со своим токеном и перечитывает его после паузы: из
+    одновременно записавших выигрывает последний, остальные ждут. Пока блокировка
+    держится, фоновый поток продлевает lease каждые ``ttl / 3`` секунд, поэтому
+    долгая запись не теряет его по истечении ``ttl``. Lease упавшего писателя
+    истекает через ``ttl`` секунд.
+
+    Это best-effort, а не взаимное исключение: без условной записи объекта два
+    писателя, чьи записи разошлись дольше паузы перечитывания, или писатель,
+    у которого продление застряло дольше ``ttl``, могут оба считать lease своим.
+    Потерю lease поток продления пишет в лог.
+    """
+    token, deadline = uuid.uuid4().hex, time.monotonic() + timeout
+    while True:
+        lease = read_lease(storage, lease_path)
+        if lease is None or lease["expires"] < time.time():
+            write_lease(storage, lease_path, token, ttl)
+            time.sleep(0.2)  # даём проявиться записи конкурента
+            if (lease := read_lease(storage, lease_path)) and lease["token"] == token:
+                break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Cache node is locked: {lease_path}")
+        time.sleep(0.1)
+
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(ttl / 3):
+            try:
+                lease = read_lease(storage, lease_path)
+                if lease is None or lease["token"] != token:
+                    logger.warning(
+                        "Lease %s was taken over by another writer", lease_path
+                    )
+                    return
+                write_lease(storage, lease_path, token, ttl)
+            except Exception:
+                logger.warning("Failed to renew lease %s", lease_path, exc_info=True)
+
+    renewer = threading.Thread(target=renew, name="NodeCacheLease", daemon=True)
+    renewer.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        renewer.join()
+        if (lease := read_lease(storage, lease_path)) and lease["token"] == token:
+            with suppress(FileNotFoundError):
+                storage.remove(lease_path)
+
+
+def write_lease(storage: StorageBackend, lease_path: str, token: str, ttl: float):
+    payload = {"token": token, "expires": time.time() + ttl}
+    storage.write_bytes(lease_path, json.dumps(payload).encode())
+
+
+def read_lease(storage: StorageBackend, lease_path: str) -> Optional[dict]:
+    try:
+        return json.loads(storage.read_bytes(lease_path))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def release_node_refs(storage: StorageBackend, path: str, manifest_name: str) -> None:
+    """Снимает ссылки узла на общие blob'ы (dedup) перед удалением узла"""
+    for info in read_manifest_artifacts(storage, path, manifest_name).values():
+        if info.get("ref"):
+            release_blob_ref(info["ref"])
+
+
+def blob_owned_by(ref_path: str, node_path: str) -> bool:
+    """Все ссылки на blob — из таблиц этого узла (blob освободится вместе с узлом)"""
+    try:
+        owners = os.listdir(os.path.dirname(ref_path))
+    except FileNotFoundError:
+        return True
+    return all(unquote(owner).startswith(f"{node_path}/") for owner in owners)
+
+
+def release_blob_ref(ref_path: str) -> bool:
+    """
+    Снимает ссылку узла на blob и удаляет blob, если ссылок больше нет.
+
+    Выполняется под той же блокировкой, что и создание ссылки в ``_save_blob``:
+    иначе писатель мог бы создать ссылку на blob, который тут же удалят.
+    """
+    refs_dir = os.path.dirname(ref_path)
+    blob_path = refs_dir.removesuffix(".refs")
+    with blob_lock(blob_path):
+        with suppress(FileNotFoundError):
+            os.unlink(ref_path)
+        try:
+            os.rmdir(refs_dir)
+        except OSError:  # ещё есть ссылки (или папку уже удалили)
+            return False
+        with suppress(FileNotFoundError):
+            os.unlink(blob_path)
+    return True
+
+
+def collect_orphan_refs(objects_root: str) -> int:
+    """
+    Снимает ссылки на blob'ы, у которых нет владельца: папки снимка, которому
+    принадлежит таблица, больше нет (запись упала или процесс завершился до
+    манифеста). Ссылка создаётся уже после папки снимка, поэтому ссылки текущих
+    записей не затрагиваются.
+
+    :return: число снятых ссылок.
+    """
+    released = 0
+    for refs_dir in glob.glob(f"{objects_root}/*/*.parquet.refs"):
+        try:
+            owners = os.listdir(refs_dir)
+        except FileNotFoundError:
+            continue
+        for owner in owners:
+            if not os.path.isdir(os.path.dirname(unquote(owner))):
+                release_blob_ref(f"{refs_dir}/{owner}")
+                released += 1
+    return released
+
+
+@contextmanager
+def blob_lock(blob_path: str):
+    """
+    Блокировка группы blob'ов с общим префиксом хэша: файл ``.lock`` в папке группы.
+    Файл не удаляется — иначе процессы могли бы держать блокировки разных файлов.
+    """
+    group_path = os.path.dirname(blob_path)
+    os.makedirs(group_path, exist_ok=True)
+    with LocalStorage().lock(
+        f"{group_path}/{CacheManager.LOCK_NAME}",
+        CacheManager.LOCK_TIMEOUT,
+        CacheManager.LEASE_TTL,
+    ):
+        yield
+
+
+class HashingWriter(io.RawIOBase):
+    """Локальный файл для записи, который по пути считает хэш и размер записанных байт"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+        self._digest = hashlib.blake2b(digest_size=16)
+        self.nbytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        self.nbytes += len(memoryview(data).cast("B"))
+        return self._file.write(data)
+
+    def tell(self) -> int:
+        return self.nbytes
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        # ParquetWriter и pandas могут закрыть поток сами — повторный close безопасен
+        super().close()
+        self._file.close()
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def describe_parquet(data_path: str, content_hash: Optional[str] = None) -> dict:
+    """Краткое описание parquet-файла для манифеста: схема, строки, размер, хэш содержимого"""
+    meta = pq.read_metadata(data_path)
+    if content_hash is None:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(data_path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+
+    return {
+        "path": data_path,
+        "schema": [
+            [field.name, str(field.type)] for field in meta.schema.to_arrow_schema()
+        ],
+        "num_rows": meta.num_rows,
+        "num_bytes": os.path.getsize(data_path),
+        "hash": content_hash,
+        "columns": describe_columns(meta),
+    }
+
+
+def profile_paths(data_path: str, profile_dir: str) -> tuple[str, str]:
+    """Пути превью и статистики таблицы: папка PROFILE_DIR рядом с её parquet-файлом"""
+    folder, file_name = data_path.rsplit("/", 1)
+    stem = file_name.removesuffix(".parquet")
+    return (
+        f"{folder}/{profile_dir}/{stem}.parquet",
+        f"{folder}/{profile_dir}/{stem}.json",
+    )
+
+
+def parquet_profile(meta: pq.FileMetaData) -> dict:
+    """
+    Статистика колонок из футера parquet: число null, min и max по всем row group'ам.
+    Значение остаётся None, если хотя бы в одном row group статистики нет.
+    """
+    columns = {
+        field.name: {"type": str(field.type), "nulls": 0, "min": None, "max": None}
+        for field in meta.schema.to_arrow_schema()
+    }
+    bounds = {name: {"min": [], "max": []} for name in columns}
+    incomplete = set()  # колонки, у которых в каком-то row group нет min/max
+    leaves = {meta.schema.column(j).path for j in range(meta.num_columns)}
+    for i in range(meta.num_row_groups):
+        row_group = meta.row_group(i)
+        for j in range(row_group.num_columns):
+            chunk = row_group.column(j)
+            name = chunk.path_in_schema
+            column = columns.get(name)  # вложенные колонки пропускаем
+            if column is None:
+                continue
+            statistics = chunk.statistics
+            if column["nulls"] is not None:
+                column["nulls"] = (
+                    column["nulls"] + statistics.null_count
+                    if statistics is not None and statistics.has_null_count
+                    else None
+                )
+            if statistics is not None and statistics.has_min_max:
+                bounds[name]["min"].append(statistics.min)
+                bounds[name]["max"].append(statistics.max)
+            # у row group'а только из null min/max нет, но границы он не меняет
+            elif not (
+                statistics is not None
+                and statistics.has_null_count
+                and statistics.null_count == chunk.num_values
+            ):
+                incomplete.add(name)
+
+    for name, column in columns.items():
+        if name not in leaves:
+            column["nulls"] = None  # struct/list: статистики только у вложенных колонок
+        elif column["nulls"] is not None:
+            column["count"] = meta.num_rows - column["nulls"]
+        bound = bounds[name]
+        if name not in incomplete and bound["min"]:
+            with suppress(TypeError):
+                column["min"] = json_value(min(bound["min"]))
+                column["max"] = json_value(max(bound["max"]))
+    return {"num_rows": meta.num_rows, "columns": columns}
+
+
+def frame_profile(df: pd.DataFrame, columns: dict[str, dict], top: int) -> None:
+    """
+    Дополняет статистику колонок агрегатами по DataFrame: недостающие null/min/max
+    и частые значения для строковых, категориальных и логических колонок.
+    """
+    missing_nulls = [c for c in df.columns if columns.get(c, {}).get("nulls") is None]
+    if missing_nulls:
+        for column, nulls in df[missing_nulls].isna().sum().items():
+            if column in columns:
+                columns[column].update(nulls=int(nulls), count=len(df) - int(nulls))
+
+    for column in df.columns:
+        stats = columns.get(column)
+        if stats is None:
+            continue
+        series = df[column]
+        if stats.get("min") is None and (
+            pd.api.types.is_numeric_dtype(series)
+            or pd.api.types.is_datetime64_any_dtype(series)
+        ):
+            with suppress(TypeError, ValueError):
+                stats["min"] = json_value(series.min())
+                stats["max"] = json_value(series.max())
+        if (
+            pd.api.types.is_object_dtype(series)
+            or pd.api.types.is_string_dtype(series)
+            or isinstance(series.dtype, pd.CategoricalDtype)
+            or pd.api.types.is_bool_dtype(series)
+        ):
+            with suppress(TypeError):  # нехэшируемые значения (list, dict)
+                counts = series.value_counts(dropna=True)
+                stats["distinct"] = len(counts)
+                stats["top"] = [
+                    [json_value(value), int(count)]
+                    for value, count in counts.head(top).items()
+                ]
+
+
+def json_value(value) -> Any:
+    """Скаляр статистики в JSON-представлении: числа и строки как есть, даты в ISO"""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    with suppress(TypeError, ValueError):
+        if pd.isna(value):  # NaN, NaT, pd.NA
+            return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        with suppress(ValueError, TypeError):
+            value = value.item()  # numpy-скаляры
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return str(value)
+
+
+def describe_columns(meta: pq.FileMetaData) -> dict[str, dict]:
+    """Индекс колонок parquet-файла: тип и размер (сжатый и несжатый) по всем row group'ам"""
+    columns = {
+        field.name: {"type": str(field.type), "nbytes": 0, "raw_nbytes": 0}
+        for field in meta.schema.to_arrow_schema()
+    }
+    for i in range(meta.num_row_groups):
+        row_group = meta.row_group(i)
+        for j in range(row_group.num_columns):
+            chunk = row_group.column(j)
+            # вложенные колонки (struct, list) учитываются в колонке верхнего уровня
+            column = columns.get(chunk.path_in_schema.split(".", 1)[0])
+            if column is not None:
+                column["nbytes"] += chunk.total_compressed_size
+                column["raw_nbytes"] += chunk.total_uncompressed_size
+    return columns
+
+
+def resolve_columns(
+    columns: list[str], names: Iterable[str], prefix: str = "", path: str = ""
+) -> list[str]:
+    """
+    Физические имена запрошенных колонок: «чистое» имя или «грязное» из ``hash_columns_list``.
+
+    :raises UnknownColumnsError: если части колонок нет ни под одним из имён.
+    """
+    names = names if isinstance(names, (set, dict)) else set(names)
+    resolved, missing = [], []
+    for clean, hashed in zip(columns, hash_columns_list(columns, prefix)):
+        if clean in names:
+            resolved.append(clean)
+        elif hashed in names:
+            resolved.append(hashed)
+        else:
+            missing.append(clean)
+    if missing:
+        raise UnknownColumnsError(missing, path)
+    return resolved
+
+
+def read_parquet_rows(
+    parquet_file: pq.ParquetFile,
+    columns: list | None,
+    row_start: int = 0,
+    row_length: int | None = None,
+) -> pl_DataFrame:
+    """
+    Читает строки ``[row_start, row_start + row_length)``, декодируя только те row group'ы,
+    которые пересекаются с диапазоном. Границы row group'ов берутся из футера parquet.
+    """
+    meta = parquet_file.metadata
+    row_start = max(0, row_start)
+    row_end = (
+        meta.num_rows
+        if row_length is None
+        else min(meta.num_rows, row_start + max(0, row_length))
+    )
+
+    row_groups, skip, offset = [], 0, 0
+    for i in range(meta.num_row_groups):
+        group_rows = meta.row_group(i).num_rows
+        if offset + group_rows > row_start and offset < row_end:
+            if not row_groups:
+                skip = row_start - offset  # сколько строк отбросить в первом row group
+            row_groups.append(i)
+        offset += group_rows
+
+    if row_groups:
+        table = parquet_file.read_row_groups(row_groups, columns=columns)
+    else:
+        table = parquet_file.schema_arrow.empty_table()
+        if columns is not None:
+            table = table.select(columns)
+
+    return pl.from_arrow(table.slice(skip, max(0, row_end - row_start)))
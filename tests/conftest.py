@@ -0,0 +1,20 @@
+import builtins
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "code"))
+
+# менеджеры кэша импортируют пакет graph и берут create_folder из окружения графа;
+# без них тесты не собираются, а не падают на импорте
+if importlib.util.find_spec("graph") is None or not hasattr(builtins, "create_folder"):
+    collect_ignore_glob = ["test_*.py"]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Кэш по умолчанию лежит в относительном CACHE_ROOT — работаем во временной папке"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
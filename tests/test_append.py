@@ -0,0 +1,96 @@
+import os
+
+import pandas as pd
+import pytest
+
+from new_cache_manager import CacheManager
+
+
+def append(df, **kwargs):
+    cache = CacheManager()
+    cache.append_node("n", "p", [{"name": "o", "data": {"k": df}}], **kwargs)
+    return cache
+
+
+def read(**kwargs):
+    return CacheManager.open("p", "n").read_data_cache(**kwargs)[0]["data"]["k"]
+
+
+def files():
+    cache = CacheManager.open("p", "n")
+    return cache.artifact_info(cache.artifact_path("k"))["files"]
+
+
+def test_append_adds_files_and_keeps_old_ones(workdir):
+    append(pd.DataFrame({"a": [1, 2]}))
+    (first,) = files()
+    append(pd.DataFrame({"a": [3]}))
+
+    assert [f["path"] for f in files()][0] == first["path"]
+    assert [f["num_rows"] for f in files()] == [2, 1]
+    assert read()["a"].tolist() == [1, 2, 3]
+
+
+def test_lazy_page_skips_whole_files(workdir):
+    for start in (0, 5, 10):
+        append(pd.DataFrame({"a": range(start, start + 5)}))
+
+    page = read(lazy_read=True, row_start=7, row_length=5)
+    assert page["a"].to_list() == list(range(7, 12))
+
+
+def test_upsert_replaces_only_partitions_in_delta(workdir):
+    append(pd.DataFrame({"day": [1, 1, 2], "v": [10, 11, 20]}), partition_by="day")
+    day_two = next(f["path"] for f in files() if f["partition_value"] == 2)
+    old_day_one = next(f["path"] for f in files() if f["partition_value"] == 1)
+
+    append(
+        pd.DataFrame({"day": [1, 3], "v": [12, 30]}),
+        partition_by="day",
+        mode="upsert",
+    )
+
+    data = read().sort_values("v")
+    assert data["v"].tolist() == [12, 20, 30]
+    assert day_two in [f["path"] for f in files()]
+    assert not os.path.exists(old_day_one)
+
+
+def test_partition_filter_opens_matching_files_only(workdir, monkeypatch):
+    append(pd.DataFrame({"day": [1, 2, 3], "v": [10, 20, 30]}), partition_by="day")
+    opened = []
+    load = CacheManager.load_df_parquet
+
+    def spy(self, data_path, *args, **kwargs):
+        opened.append(data_path)
+        return load(self, data_path, *args, **kwargs)
+
+    monkeypatch.setattr(CacheManager, "load_df_parquet", spy)
+
+    assert read(filters=[("day", ">=", 2)])["v"].tolist() == [20, 30]
+    assert len(opened) == 2
+
+    opened.clear()
+    empty = read(filters=[("day", "==", 5)])
+    assert len(opened) == 1
+    assert empty.empty and list(empty.columns) == ["day", "v"]
+
+
+def test_single_file_key_cannot_be_appended(workdir):
+    CacheManager().save_node(
+        "n", "p", [{"name": "o", "data": {"k": pd.DataFrame({"a": [1]})}}]
+    )
+
+    with pytest.raises(ValueError, match="single file"):
+        append(pd.DataFrame({"a": [2]}))
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"mode": "merge"}, {"mode": "upsert"}, {"partition_by": "a"}],
+)
+def test_invalid_append_arguments(workdir, kwargs):
+    append(pd.DataFrame({"a": [1]}))
+    with pytest.raises(ValueError):
+        append(pd.DataFrame({"a": [2]}), **kwargs)
+    assert read()["a"].tolist() == [1]
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from new_cache_manager import CacheManager
+
+
+def test_artifact_info_resolves_blob_and_dataset_paths(workdir):
+    frames = {f"k{i}": pd.DataFrame({"a": [i] * 10}) for i in range(20)}
+    cache = CacheManager(dedup=True)
+    cache.save_node("n", "p", [{"name": "o", "data": frames}])
+    delta = {"ds": pd.DataFrame({"g": [1, 2], "v": [3, 4]})}
+    cache.append_node("n", "p", [{"name": "d", "data": delta}], partition_by="g")
+
+    reader = CacheManager.open("p", "n")
+    for info in reader.artifacts.values():
+        assert reader.artifact_info(info["path"]) is info
+        for file in info.get("files", []):
+            assert reader.artifact_info(file["path"]) is info
+    assert reader.artifact_info("missing.parquet") is None
+
+    # попадание в индекс его не перестраивает
+    index = reader._artifact_index
+    blob = next(iter(reader.artifacts.values()))["path"]
+    assert reader.artifact_info(blob) is not None
+    assert reader._artifact_index is index
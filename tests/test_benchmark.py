@@ -0,0 +1,75 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+BENCHMARK = Path(__file__).resolve().parent.parent / "benchmarks" / "cache_benchmark.py"
+spec = importlib.util.spec_from_file_location("cache_benchmark", BENCHMARK)
+cache_benchmark = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cache_benchmark)
+
+
+def case(**metrics):
+    base = dict.fromkeys(cache_benchmark.REGRESSION_METRICS, 1.0)
+    return {"status": "ok", **base, **metrics}
+
+
+# parquet не кодирует object-колонку со значениями разных типов — случай пишется ошибкой
+ARROW_LIMITED = {"mixed_object"}
+
+
+@pytest.mark.parametrize(
+    "scenario", sorted(set(cache_benchmark.SCENARIOS) - ARROW_LIMITED)
+)
+@pytest.mark.parametrize("runner", ["cache_manager", "cache_manager_lazy"])
+def test_every_scenario_runs(workdir, scenario, runner):
+    result = cache_benchmark.measure(scenario, runner, 0.001, 2, 0)
+
+    assert result["status"] == "ok", result.get("traceback")
+    assert result["payload_bytes"] > 0
+    assert result["disk_bytes"] > 0
+    assert result["save_p50"] <= result["save_max"]
+
+
+@pytest.mark.parametrize("scenario", sorted(ARROW_LIMITED))
+def test_failing_case_is_recorded_as_error(workdir, scenario):
+    result = cache_benchmark.measure(scenario, "cache_manager", 0.001, 1, 0)
+
+    assert result["status"] == "error"
+    assert "ArrowTypeError" in result["reason"]
+
+
+def test_unimportable_runner_is_skipped(workdir, monkeypatch):
+    def missing():
+        raise ImportError("no module named h5py")
+
+    monkeypatch.setitem(cache_benchmark.RUNNERS, "legacy", missing)
+    result = cache_benchmark.measure("tall", "legacy", 0.001, 1, 0)
+
+    assert result == {
+        "status": "skipped",
+        "reason": "ImportError: no module named h5py",
+    }
+
+
+def test_compare_reports_regressions_over_tolerance():
+    baseline = {
+        "cases": {
+            "a": case(),
+            "b": case(),
+            "c": {"status": "skipped", "reason": "-"},
+            "d": case(),
+        }
+    }
+    results = {
+        "cases": {
+            "a": case(save_p50=1.1),
+            "b": case(load_p50=1.5),
+            "c": {"status": "error", "reason": "boom"},
+            "d": {"status": "error", "reason": "boom"},
+        }
+    }
+
+    regressions = cache_benchmark.compare(results, baseline, tolerance=0.2)
+
+    assert regressions == ["b.load_p50: 1.5 vs baseline 1", "d: error (boom)"]
@@ -0,0 +1,97 @@
+import glob
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from new_cache_manager import (
+    CacheArtifactError,
+    CacheManager,
+    CacheQuotaManager,
+    blob_lock,
+    release_blob_ref,
+)
+
+
+def blobs():
+    return glob.glob(f"{CacheManager.OBJECTS_ROOT}/*/*.parquet")
+
+
+def test_blob_is_shared_and_removed_with_last_ref(workdir):
+    df = pd.DataFrame({"a": range(100)})
+    for node in ("n1", "n2"):
+        CacheManager(dedup=True).save_node(
+            node, "p", [{"name": "o", "data": {"k": df}}]
+        )
+    assert len(blobs()) == 1
+
+    CacheManager.delete_project_cache("p")
+    assert blobs() == []
+
+
+def test_concurrent_save_and_delete_keep_referenced_blob(workdir):
+    df = pd.DataFrame({"a": range(100)})
+
+    def cycle(i: int) -> None:
+        project = f"p{i % 4}"
+        for _ in range(10):
+            cache = CacheManager(dedup=True)
+            cache.save_node("n", project, [{"name": "o", "data": {"k": df}}])
+            # blob, на который указывает только что записанный манифест, существует
+            restored = CacheManager.open(project, "n")
+            assert os.path.isfile(restored.metadata_store[0]["data"]["k"])
+            restored.read_data_cache()
+            CacheManager.delete_project_cache(project)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(cycle, range(4)))
+    assert blobs() == []
+
+
+def test_release_waits_for_blob_lock(workdir):
+    cache = CacheManager(dedup=True)
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": pd.DataFrame({"a": [1]})}}])
+    (info,) = cache.artifacts.values()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with blob_lock(info["path"]):
+            released = pool.submit(release_blob_ref, info["ref"])
+            time.sleep(0.2)
+            assert not released.done() and os.path.isfile(info["path"])
+        assert released.result() is True
+    assert not os.path.exists(info["path"])
+
+
+def test_failed_save_releases_its_refs(workdir):
+    def broken():
+        yield pd.DataFrame({"b": [1]})
+        raise RuntimeError("source failed")
+
+    data = {"k": pd.DataFrame({"a": range(100)}), "s": broken()}
+    cache = CacheManager(dedup=True)
+    with pytest.raises(CacheArtifactError):
+        cache.save_node("n", "p", [{"name": "o", "data": data}])
+
+    assert blobs() == []
+    assert glob.glob(f"{CacheManager.OBJECTS_ROOT}/*/*.refs") == []
+    assert glob.glob(f"{cache.path}/gen-*") == []
+
+
+def test_sweep_drops_refs_of_vanished_snapshots(workdir):
+    df = pd.DataFrame({"a": range(100)})
+    kept = CacheManager(dedup=True)
+    kept.save_node("n1", "p", [{"name": "o", "data": {"k": df}}])
+    crashed = CacheManager(dedup=True)
+    crashed.save_node("n2", "p", [{"name": "o", "data": {"k": df}}])
+    shutil.rmtree(crashed.path)  # узел пропал без снятия ссылок
+
+    CacheQuotaManager(max_bytes=1 << 30).sweep()
+
+    (info,) = kept.artifacts.values()
+    assert os.listdir(os.path.dirname(info["ref"])) == [os.path.basename(info["ref"])]
+    shutil.rmtree(kept.path)
+    CacheQuotaManager(max_bytes=1 << 30).sweep()
+    assert blobs() == []
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+from graph.core.patameters.tools import hash_columns_list
+
+from new_cache_manager import CacheManager, UnknownColumnsError
+
+HASHED = hash_columns_list(["value"])[0]
+
+
+@pytest.fixture
+def cache(workdir):
+    df = pd.DataFrame({"a": range(10), HASHED: range(10, 20)})
+    cache = CacheManager()
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": df}}])
+    return CacheManager.open("p", "n")
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"read_format": "pandas"}, {"read_format": "arrow"}, {"lazy_read": True}],
+)
+def test_unknown_filter_column_is_not_a_broken_cache(cache, options):
+    with pytest.raises(UnknownColumnsError) as err:
+        cache.read_data_cache(filters=[("zz", ">", 1)], **options)
+    assert err.value.columns == ["zz"]
+
+
+def test_unknown_column_in_polars_expression(cache):
+    import polars as pl
+
+    with pytest.raises(UnknownColumnsError):
+        cache.read_data_cache(filters=pl.col("zz") > 1)
+
+
+@pytest.mark.parametrize("filters", [[("a", "~", 1)], [("a", ">")]])
+def test_malformed_filter_raises_value_error(cache, filters):
+    with pytest.raises(ValueError):
+        cache.read_data_cache(filters=filters)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"read_format": "pandas"}, {"read_format": "arrow"}, {"lazy_read": True}],
+)
+def test_clean_filter_name_resolves_to_hashed_column(cache, options):
+    data = cache.read_data_cache(filters=[("value", ">=", 18)], **options)
+    assert len(data[0]["data"]["k"]) == 2
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"read_format": "pandas"},
+        {"read_format": "arrow"},
+        {"read_format": "pandas_arrow"},
+        {"lazy_read": True},
+    ],
+)
+@pytest.mark.parametrize("append", [False, True])
+def test_filter_name_resolves_with_prefix(workdir, options, append):
+    (prefixed,) = hash_columns_list(["value"], "pre")
+    df = pd.DataFrame({"a": range(10), prefixed: range(10)})
+    write = CacheManager().append_node if append else CacheManager().save_node
+    write("n", "p", [{"name": "o", "data": {"k": df}}])
+
+    data = CacheManager.open("p", "n").read_data_cache(
+        filters=[("value", ">=", 8)], prefix="pre", **options
+    )
+    assert len(data[0]["data"]["k"]) == 2
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from new_cache_manager import CacheManager, fingerprint_frame
+
+LOOKALIKES = [
+    ([1, 2], ["1", "2"]),
+    ([1.0, 2.5], ["1.0", "2.5"]),
+    ([True, False], ["True", "False"]),
+]
+
+
+def frame(values) -> pd.DataFrame:
+    return pd.DataFrame({"a": pd.Series(values, dtype=object)})
+
+
+def read(cache: CacheManager) -> list:
+    return cache.read_data_cache()[0]["data"]["k"]["a"].tolist()
+
+
+@pytest.mark.parametrize("first, second", LOOKALIKES)
+def test_object_values_of_different_types_differ(first, second):
+    assert fingerprint_frame(frame(first)) != fingerprint_frame(frame(second))
+    assert fingerprint_frame(frame(first)) == fingerprint_frame(frame(list(first)))
+
+
+@pytest.mark.parametrize("first, second", LOOKALIKES)
+def test_skip_unchanged_rewrites_retyped_column(workdir, first, second):
+    cache = CacheManager()
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": frame(first)}}])
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": frame(second)}}])
+
+    assert read(CacheManager.open("p", "n")) == second
+
+
+@pytest.mark.parametrize("first, second", LOOKALIKES)
+def test_dedup_does_not_share_blob_across_types(workdir, first, second):
+    CacheManager(dedup=True).save_node(
+        "n1", "p", [{"name": "o", "data": {"k": frame(first)}}]
+    )
+    CacheManager(dedup=True).save_node(
+        "n2", "p", [{"name": "o", "data": {"k": frame(second)}}]
+    )
+
+    assert read(CacheManager.open("p", "n1")) == first
+    assert read(CacheManager.open("p", "n2")) == second
+
+
+def test_mixed_object_column_is_written_without_fingerprint(workdir):
+    cache = CacheManager()
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": frame([1, 2])}}])
+    (info,) = cache.artifacts.values()
+    assert "fingerprint" in info
+
+    mixed = pd.DataFrame({"a": [1, 2], "b": pd.Series([[1], [2, 3]])})
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": mixed}}])
+    assert read(CacheManager.open("p", "n")) == [1, 2]
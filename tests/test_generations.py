@@ -0,0 +1,72 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from new_cache_manager import CacheManager
+
+
+def save(rows):
+    cache = CacheManager()
+    cache.save_node(
+        "n", "p", [{"name": "o", "data": {"k": pd.DataFrame({"a": range(rows)})}}]
+    )
+    return cache
+
+
+def rows(cache):
+    return len(cache.read_data_cache()[0]["data"]["k"])
+
+
+def generations(cache):
+    return sorted(os.path.basename(p) for p in glob.glob(f"{cache.path}/gen-*"))
+
+
+def test_every_save_writes_a_new_snapshot(workdir):
+    first = save(1)
+    (first_path,) = CacheManager.open("p", "n").artifacts
+    second = save(2)
+    (second_path,) = CacheManager.open("p", "n").artifacts
+
+    assert (first.generation, second.generation) == (1, 2)
+    assert first_path.split("/")[-2] != second_path.split("/")[-2]
+    assert os.path.exists(first_path)
+
+
+def test_reader_keeps_its_snapshot_while_it_is_kept(workdir):
+    save(1)
+    reader = CacheManager.open("p", "n")
+    save(2)
+
+    assert rows(reader) == 1
+    assert reader.generation == 1
+
+
+def test_old_snapshots_are_collected(workdir):
+    for n in range(1, 5):
+        cache = save(n)
+
+    names = generations(cache)
+    assert len(names) == CacheManager.KEEP_GENERATIONS
+    assert [int(name.split("-")[1]) for name in names] == [3, 4]
+
+
+def test_reader_of_collected_snapshot_switches_to_latest(workdir):
+    save(1)
+    reader = CacheManager.open("p", "n")
+    for n in range(2, 2 + CacheManager.KEEP_GENERATIONS):
+        save(n)
+
+    assert rows(reader) == 1 + CacheManager.KEEP_GENERATIONS
+    assert reader.generation == 1 + CacheManager.KEEP_GENERATIONS
+
+
+def test_concurrent_writers_publish_consecutive_generations(workdir):
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(save, range(1, 9)))
+
+    cache = CacheManager.open("p", "n")
+    assert cache.generation == 8
+    assert len(generations(cache)) == CacheManager.KEEP_GENERATIONS
+    assert 1 <= rows(cache) <= 8
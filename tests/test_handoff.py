@@ -0,0 +1,70 @@
+import os
+import warnings
+
+import pandas as pd
+import polars as pl
+import pytest
+
+from new_cache_manager import INCOMPLETE_DATA_WARNING, CacheManager
+
+
+def frame(n: int) -> list:
+    return [{"name": "o", "data": {"k": pd.DataFrame({"a": range(n)})}}]
+
+
+def handoff_exists(cache: CacheManager) -> bool:
+    return os.path.isfile(f"{cache.path}/{cache.HANDOFF_NAME}") or os.path.isdir(
+        f"{cache.path}/{cache.HANDOFF_DIR}"
+    )
+
+
+def rows(project_id: str, node_id: str) -> int:
+    (el,) = CacheManager.attach(project_id, node_id, read_format="pandas")
+    return len(el["data"]["k"])
+
+
+def test_persisted_handoff_stays_until_superseded(workdir):
+    cache = CacheManager()
+    cache.publish_node("n", "p", frame(3)).result()
+    assert handoff_exists(cache) and rows("p", "n") == 3
+
+    CacheManager().save_node("n", "p", frame(5))
+
+    assert not handoff_exists(cache)
+    assert rows("p", "n") == 5
+
+
+def test_append_releases_handoff(workdir):
+    cache = CacheManager()
+    cache.publish_node("n", "p", frame(3)).result()
+
+    delta = [{"name": "o", "data": {"d": pd.DataFrame({"a": range(2)})}}]
+    CacheManager().append_node("n", "p", delta)
+
+    assert not handoff_exists(cache)
+    assert CacheManager.open("p", "n").handoff_token is None
+    (el,) = CacheManager.attach("p", "n", read_format="pandas")
+    assert sorted(el["data"]) == ["d", "k"]
+
+
+@pytest.mark.parametrize("method", ["save_node", "publish_node", "append_node"])
+def test_polars_frames_warn_with_shared_message(workdir, method):
+    data = [{"name": "o", "data": {"k": pl.DataFrame({"a": [1]})}}]
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        result = getattr(CacheManager(), method)("n", "p", data)
+        if method == "publish_node":
+            result.result()
+    assert [str(w.message) for w in caught] == [INCOMPLETE_DATA_WARNING]
+
+
+def test_back_to_back_publishes_persist_both_nodes(workdir):
+    cache = CacheManager()
+    first = cache.publish_node("n1", "p", frame(3))
+    second = cache.publish_node("n2", "p", frame(4))
+    first.result(), second.result()
+
+    for node, n in (("n1", 3), ("n2", 4)):
+        restored = CacheManager.open("p", node)
+        assert restored.handoff_token is not None
+        assert len(restored.read_data_cache()[0]["data"]["k"]) == n
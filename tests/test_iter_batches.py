@@ -0,0 +1,67 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+from graph.core.patameters.tools import hash_columns_list
+
+from new_cache_manager import CacheManager, UnknownColumnsError
+
+HASHED = hash_columns_list(["value"])[0]
+
+
+@pytest.fixture
+def cache(workdir):
+    df = pd.DataFrame({"a": range(25), HASHED: range(100, 125)})
+    other = pd.DataFrame({"a": range(3)})
+    CacheManager(row_group_size=10).save_node(
+        "n",
+        "p",
+        [
+            {"name": "o", "data": {"k_1": df}},
+            {"name": "other", "data": {"k_2": other}},
+        ],
+    )
+    return CacheManager.open("p", "n")
+
+
+def test_batches_cover_table_in_order(cache):
+    batches = list(cache.iter_batches("k_1", batch_size=4))
+
+    assert all(isinstance(batch, pa.RecordBatch) for batch in batches)
+    assert max(batch.num_rows for batch in batches) <= 4
+    assert pa.Table.from_batches(batches)["a"].to_pylist() == list(range(25))
+
+
+def test_batches_as_pandas_with_clean_column_name(cache):
+    batches = list(cache.iter_batches("k:1", columns=["value"], as_pandas=True))
+
+    assert all(isinstance(batch, pd.DataFrame) for batch in batches)
+    assert pd.concat(batches)[HASHED].tolist() == list(range(100, 125))
+
+
+def test_name_restricts_lookup_to_element(cache):
+    (batch,) = cache.iter_batches("k_2", name="other")
+    assert batch.num_rows == 3
+    with pytest.raises(KeyError):
+        next(cache.iter_batches("k_2", name="o"))
+
+
+def test_unknown_key_and_column(cache):
+    with pytest.raises(KeyError):
+        next(cache.iter_batches("zz"))
+    with pytest.raises(UnknownColumnsError):
+        next(cache.iter_batches("k_1", columns=["zz"]))
+
+
+def test_dataset_is_streamed_file_by_file(workdir):
+    cache = CacheManager()
+    for start in (0, 5, 10):
+        delta = pd.DataFrame({"a": range(start, start + 5)})
+        cache.append_node("n", "p", [{"name": "o", "data": {"k": delta}}])
+
+    batches = CacheManager.open("p", "n").iter_batches("k", batch_size=100)
+
+    assert [batch["a"].to_pylist() for batch in batches] == [
+        list(range(0, 5)),
+        list(range(5, 10)),
+        list(range(10, 15)),
+    ]
@@ -0,0 +1,61 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from new_cache_manager import CacheManager
+
+
+@pytest.fixture
+def cache(workdir):
+    df = pd.DataFrame({"a": range(100), "b": [str(i) for i in range(100)]})
+    CacheManager(row_group_size=10).save_node(
+        "n", "p", [{"name": "o", "data": {"k": df}}]
+    )
+    return CacheManager.open("p", "n")
+
+
+@pytest.fixture
+def decoded_groups(monkeypatch):
+    groups = []
+    read_row_groups = pq.ParquetFile.read_row_groups
+
+    def spy(self, row_groups, *args, **kwargs):
+        groups.extend(row_groups)
+        return read_row_groups(self, row_groups, *args, **kwargs)
+
+    monkeypatch.setattr(pq.ParquetFile, "read_row_groups", spy)
+    return groups
+
+
+def read(cache, **kwargs):
+    return cache.read_data_cache(lazy_read=True, **kwargs)[0]["data"]["k"]
+
+
+def test_page_decodes_only_overlapping_row_groups(cache, decoded_groups):
+    page = read(cache, row_start=25, row_length=20)
+
+    assert page["a"].to_list() == list(range(25, 45))
+    assert decoded_groups == [2, 3, 4]
+
+
+@pytest.mark.parametrize(
+    "row_start, row_length, expected",
+    [
+        (0, None, range(100)),
+        (95, None, range(95, 100)),
+        (90, 50, range(90, 100)),
+        (30, 10, range(30, 40)),
+        (40, 0, range(0)),
+    ],
+)
+def test_page_bounds(cache, row_start, row_length, expected):
+    page = read(cache, row_start=row_start, row_length=row_length)
+    assert page["a"].to_list() == list(expected)
+
+
+def test_page_past_the_end_keeps_projection(cache, decoded_groups):
+    page = read(cache, row_start=500, row_length=10, columns=["b"])
+
+    assert page.columns == ["b"]
+    assert page.height == 0
+    assert decoded_groups == []
@@ -0,0 +1,72 @@
+import json
+
+import pandas as pd
+import pytest
+
+from new_cache_manager import CacheManager
+
+
+@pytest.fixture
+def saved(workdir):
+    cache = CacheManager()
+    cache.save_node(
+        "n",
+        "p",
+        [{"name": "o", "data": {"k": pd.DataFrame({"a": range(5)}), "r": "s3://b/r"}}],
+        recompute_cost=12.5,
+        cache_key="inputs-1",
+    )
+    return cache
+
+
+def test_open_restores_node_without_pickle(saved):
+    cache = CacheManager.open("p", "n")
+
+    assert cache.metadata_store == saved.metadata_store
+    assert cache.artifacts == saved.artifacts
+    assert cache._remote_keys == {"r"}
+    assert (cache.recompute_cost, cache.cache_key) == (12.5, "inputs-1")
+    assert cache.fingerprint == saved.fingerprint
+
+    (el,) = cache.read_data_cache()
+    assert el["data"]["k"]["a"].tolist() == list(range(5))
+    assert el["data"]["r"] == "s3://b/r"
+
+
+def test_manifest_describes_tables(saved):
+    (info,) = CacheManager.open("p", "n").artifacts.values()
+
+    assert info["num_rows"] == 5
+    assert info["num_bytes"] > 0
+    assert "a" in info["columns"]
+
+
+def test_open_missing_node(workdir):
+    with pytest.raises(FileNotFoundError):
+        CacheManager.open("p", "missing")
+
+
+def test_open_rejects_unknown_manifest_version(saved):
+    manifest_path = f"{saved.path}/{CacheManager.MANIFEST_NAME}"
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest["version"] = CacheManager.MANIFEST_VERSION + 1
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    with pytest.raises(ValueError, match="manifest version"):
+        CacheManager.open("p", "n")
+
+
+def test_is_valid_reads_cache_key_from_manifest(saved):
+    assert CacheManager.read_cache_key("p", "n") == "inputs-1"
+    assert CacheManager.is_valid("p", "n", "inputs-1")
+    assert not CacheManager.is_valid("p", "n", "inputs-2")
+    assert not CacheManager.is_valid("p", "missing", "inputs-1")
+
+
+def test_make_cache_key_is_deterministic():
+    key = CacheManager.make_cache_key({"b": 1, "a": [1, 2]}, "upstream")
+
+    assert key == CacheManager.make_cache_key({"a": [1, 2], "b": 1}, "upstream")
+    assert key != CacheManager.make_cache_key({"a": [1, 2], "b": 2}, "upstream")
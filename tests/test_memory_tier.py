@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+from new_cache_manager import CacheManager, MemoryCacheTier
+
+
+def frame(rows):
+    return pd.DataFrame({"a": range(rows)})
+
+
+@pytest.fixture
+def tier(workdir, monkeypatch):
+    tier = MemoryCacheTier()
+    monkeypatch.setattr(CacheManager, "memory_tier", tier)
+    return tier
+
+
+def save(node, df, project="p"):
+    cache = CacheManager()
+    cache.save_node(node, project, [{"name": "o", "data": {"k": df}}])
+    return cache
+
+
+def read(cache, **kwargs):
+    return cache.read_data_cache(**kwargs)[0]["data"]["k"]
+
+
+def test_tier_evicts_least_recently_used_by_bytes():
+    first, second, third = frame(100), frame(100), frame(100)
+    size = first.memory_usage(index=True, deep=True).sum()
+    tier = MemoryCacheTier(max_bytes=2 * size)
+
+    tier.put(("first",), first)
+    tier.put(("second",), second)
+    assert tier.get(("first",)) is first
+    tier.put(("third",), third)
+
+    assert tier.get(("second",)) is None
+    assert tier.get(("first",)) is first
+    assert tier.get(("third",)) is third
+    assert tier.stats()["evictions"] == 1
+    assert tier.nbytes == 2 * size
+
+
+def test_tier_skips_table_larger_than_limit():
+    tier = MemoryCacheTier(max_bytes=10)
+    tier.put(("big",), frame(100))
+
+    assert tier.stats()["entries"] == 0
+    assert tier.nbytes == 0
+
+
+def test_invalidate_matches_whole_path_components():
+    tier = MemoryCacheTier()
+    tier.put(("cache/n1/o.parquet",), frame(1))
+    tier.put(("cache/n10/o.parquet",), frame(1))
+
+    assert tier.invalidate("cache/n1") == 1
+    assert tier.get(("cache/n10/o.parquet",)) is not None
+
+
+def test_repeated_read_is_served_from_tier(tier):
+    save("n", frame(10))
+
+    first = read(CacheManager.open("p", "n"))
+    first["b"] = 1  # копия читателя не меняет общий экземпляр
+    second = read(CacheManager.open("p", "n"))
+
+    assert (tier.hits, tier.misses) == (1, 1)
+    assert list(second.columns) == ["a"]
+
+
+def test_tier_key_separates_read_formats(tier):
+    cache = save("n", frame(10))
+
+    assert isinstance(read(cache), pd.DataFrame)
+    assert not isinstance(read(cache, lazy_read=True), pd.DataFrame)
+    assert tier.stats()["entries"] == 2
+
+
+def test_save_invalidates_node_entries(tier):
+    save("n", frame(10))
+    read(CacheManager.open("p", "n"))
+    save("other", frame(3))
+    read(CacheManager.open("p", "other"))
+
+    save("n", frame(20))
+
+    assert tier.stats()["entries"] == 1
+    assert len(read(CacheManager.open("p", "n"))) == 20
+
+
+def test_delete_project_cache_invalidates_entries(tier):
+    save("n", frame(10))
+    read(CacheManager.open("p", "n"))
+    save("n", frame(10), project="q")
+    read(CacheManager.open("q", "n"))
+
+    CacheManager.delete_project_cache("p")
+
+    assert tier.stats()["entries"] == 1
+    assert tier.nbytes > 0
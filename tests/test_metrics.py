@@ -0,0 +1,23 @@
+import uuid
+
+import pandas as pd
+
+from new_cache_manager import CacheManager, InMemoryMetrics
+
+
+def opens(storage_root: str = "") -> list[dict]:
+    metrics = InMemoryMetrics()
+    cache = CacheManager(storage_root)
+    cache.metrics = metrics
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": pd.DataFrame({"a": [1]})}}])
+    cache.read_data_cache()
+    return [row for row in metrics.snapshot() if row["op"] == "open"]
+
+
+def test_open_is_not_recorded_for_local_storage(workdir):
+    assert opens() == []
+
+
+def test_open_is_recorded_for_remote_storage(workdir):
+    (row,) = opens(f"memory://nodecache-{uuid.uuid4().hex}")
+    assert row["mode"] == "FsspecStorage" and row["count"] >= 1
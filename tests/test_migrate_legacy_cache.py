@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("tables")
+pytest.importorskip("h5py")
+pytest.importorskip("graph.config")
+
+import migrate_legacy_cache as migration  # noqa: E402
+from new_cache_manager import CacheManager  # noqa: E402
+from old_cache_manager import Cache  # noqa: E402
+
+FRAME = pd.DataFrame({"a": np.arange(2_500), "s": ["x", "y"] * 1_250})
+
+
+@pytest.fixture
+def legacy_node(workdir):
+    df = FRAME.copy()
+    cache = Cache()
+    cache.save_data(
+        {
+            "input": {},
+            "output": [
+                {"name": "out", "data": {"k:x": df, "r": "s3://bucket/x.parquet"}},
+                {"name": "o2", "data": {"y": df.head(5)}},
+            ],
+        },
+        "n",
+        "p",
+    )
+    return cache
+
+
+def test_migrate_node_keeps_keys_and_rows(legacy_node):
+    result = migration.migrate_node("p", "n", chunk_rows=1_000)
+
+    assert (result.status, result.tables, result.rows) == ("migrated", 2, 2_505)
+    migrated = CacheManager.open("p", "n").read_data_cache()
+    # те же ключи, что возвращает Cache.load_data
+    assert [sorted(el["data"]) for el in migrated] == [["k:x:out"], ["y:o2"]]
+    pd.testing.assert_frame_equal(
+        migrated[0]["data"]["k:x:out"], FRAME, check_dtype=False
+    )
+
+
+def test_migrate_node_with_legacy_object_keeps_remote_refs(legacy_node):
+    migration.migrate_node("p", "n", legacy=legacy_node)
+
+    migrated = CacheManager.open("p", "n").read_data_cache()
+    assert migrated[0]["data"]["r"] == "s3://bucket/x.parquet"
+
+
+def test_migrate_cache_resumes(legacy_node):
+    first = migration.migrate_cache(workers=1)
+    second = migration.migrate_cache(workers=1)
+
+    assert [r.status for r in first] == ["migrated"]
+    assert [r.status for r in second] == ["skipped"]
@@ -0,0 +1,37 @@
+import pickle
+
+import pandas as pd
+
+from new_cache_manager import CacheManager
+
+# атрибуты CacheManager до манифестов, снимков и хранилищ
+LEGACY_ATTRIBUTES = {
+    "metadata_store",
+    "storage_root",
+    "cache_dir",
+    "nodes_dir",
+    "storage_options",
+    "path",
+    "node_id",
+    "project_id",
+    "_remote_keys",
+}
+
+
+def test_unpickle_cache_from_before_manifests(workdir):
+    df = pd.DataFrame({"a": range(10)})
+    cache = CacheManager()
+    cache.save_node("n", "p", [{"name": "o", "data": {"k_x": df, "r": "s3://b/x"}}])
+    state = {
+        key: value for key, value in cache.__dict__.items() if key in LEGACY_ATTRIBUTES
+    }
+    state["_remote_keys"] = list(state["_remote_keys"])
+    legacy = CacheManager.__new__(CacheManager)
+    legacy.__dict__.update(state)
+
+    restored = pickle.loads(pickle.dumps(legacy))
+
+    assert restored._remote_keys == {"r"}
+    data = restored.read_data_cache()[0]["data"]
+    pd.testing.assert_frame_equal(data["k:x"], df)
+    assert data["r"] == "s3://b/x"
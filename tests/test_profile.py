@@ -0,0 +1,33 @@
+import pandas as pd
+
+from new_cache_manager import CacheManager
+
+
+def test_profile_with_null_only_row_group(workdir):
+    df = pd.DataFrame({"a": [None] * 10_000 + [1.0] * 10_000 + [3.0] * 5})
+    cache = CacheManager(profile=True, write_policy="preview-optimized")
+    cache.save_node("n", "p", [{"name": "o", "data": {"x": df}}])
+
+    stats = CacheManager.open("p", "n").column_stats("x")
+
+    assert stats["num_rows"] == 20_005
+    assert stats["columns"]["a"] == {
+        "type": "double",
+        "nulls": 10_000,
+        "count": 10_005,
+        "min": 1.0,
+        "max": 3.0,
+    }
+
+
+def test_preview_and_top_values(workdir):
+    df = pd.DataFrame({"a": range(500), "s": ["x", "y", "x", None, "x"] * 100})
+    cache = CacheManager(profile=True)
+    cache.save_node("n", "p", [{"name": "o", "data": {"k_x": df}}])
+
+    restored = CacheManager.open("p", "n")
+    assert restored.preview("k:x").shape == (CacheManager.PREVIEW_ROWS, 2)
+    assert restored.preview("k:x", rows=5)["a"].to_list() == [0, 1, 2, 3, 4]
+    column = restored.column_stats("k:x")["columns"]["s"]
+    assert column["nulls"] == 100
+    assert column["top"] == [["x", 300], ["y", 100]]
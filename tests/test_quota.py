@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+from new_cache_manager import (
+    CacheManager,
+    CacheMissError,
+    CacheQuotaManager,
+    LocalStorage,
+)
+
+
+def save(node, df, **kwargs):
+    cache = CacheManager(**kwargs)
+    cache.save_node(node, "p", [{"name": "o", "data": {"k": df}}])
+    return cache
+
+
+def test_node_size_counts_snapshots_and_sidecars(workdir):
+    cache = save("n", pd.DataFrame({"a": range(1_000)}), profile=True)
+    save("n", pd.DataFrame({"a": range(2_000)}), profile=True)
+
+    (node,) = CacheQuotaManager(max_bytes=1 << 30).scan()
+
+    assert node.nbytes == LocalStorage().du(cache.path)
+    assert node.nbytes > sum(
+        info["num_bytes"] for info in CacheManager.open("p", "n").artifacts.values()
+    )
+
+
+def test_shared_blob_is_counted_once(workdir):
+    df = pd.DataFrame({"a": range(10_000)})
+    first, _ = save("n1", df, dedup=True), save("n2", df, dedup=True)
+    (blob,) = first.artifacts.values()
+
+    report = CacheQuotaManager(max_bytes=1 << 30).report()
+
+    nodes = report["projects"]["p"]["nodes"]
+    assert report["shared_nbytes"] == blob["num_bytes"]
+    assert (
+        report["nbytes"] == sum(n["nbytes"] for n in nodes.values()) + blob["num_bytes"]
+    )
+    assert all(n["nbytes"] < blob["num_bytes"] for n in nodes.values())
+
+
+def test_evict_skips_node_being_written(workdir):
+    cache = save("n", pd.DataFrame({"a": range(10)}))
+    quota = CacheQuotaManager(max_bytes=0, min_idle=0)
+    (node,) = quota.scan()
+
+    with cache.node_lock():
+        assert quota.evict_node(node) is False
+    assert os.path.isdir(cache.path)
+
+    assert quota.evict_node(node) is True
+    assert not os.path.exists(cache.path)
+
+
+def test_read_after_sweep_is_a_cache_miss(workdir):
+    save("n", pd.DataFrame({"a": range(10)}))
+    reader = CacheManager.open("p", "n")
+
+    report = CacheQuotaManager(max_bytes=0, min_idle=0).sweep()
+
+    assert len(report["evicted"]) == 1
+    with pytest.raises(CacheMissError) as err:
+        reader.read_data_cache()
+    assert isinstance(err.value, FileNotFoundError)
+    with pytest.raises(FileNotFoundError):
+        CacheManager.open("p", "n")
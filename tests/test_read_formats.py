@@ -0,0 +1,47 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from new_cache_manager import CacheManager
+
+
+@pytest.fixture
+def cache(workdir):
+    df = pd.DataFrame({"a": range(5), "b": list("abcde")})
+    CacheManager().save_node("n", "p", [{"name": "o", "data": {"k": df}}])
+    return CacheManager.open("p", "n")
+
+
+def read(cache, **kwargs):
+    return cache.read_data_cache(**kwargs)[0]["data"]["k"]
+
+
+def test_arrow_format_returns_table(cache):
+    table = read(cache, read_format="arrow")
+
+    assert isinstance(table, pa.Table)
+    assert table.column_names == ["a", "b"]
+    assert table["a"].to_pylist() == list(range(5))
+
+
+def test_pandas_arrow_format_keeps_arrow_dtypes(cache):
+    df = read(cache, read_format="pandas_arrow")
+
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+    assert df["b"].tolist() == list("abcde")
+
+
+def test_formats_return_same_values(cache):
+    expected = read(cache)
+
+    pd.testing.assert_frame_equal(
+        read(cache, read_format="arrow").to_pandas(), expected
+    )
+    pd.testing.assert_frame_equal(
+        read(cache, read_format="pandas_arrow"), expected, check_dtype=False
+    )
+
+
+def test_unknown_read_format(cache):
+    with pytest.raises(ValueError, match="read_format"):
+        read(cache, read_format="numpy")
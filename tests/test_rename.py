@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from new_cache_manager import CacheManager, MemoryCacheTier, rename_columns
+
+
+def save(data):
+    cache = CacheManager()
+    cache.save_node("n", "p", [{"name": "o", "data": data}])
+    return CacheManager.open("p", "n")
+
+
+def test_rename_columns_keeps_buffers():
+    df = pd.DataFrame({"a": np.arange(5), "b": np.arange(5)})
+    values = df["a"].to_numpy()
+
+    renamed = rename_columns(df, {"a": "x"})
+
+    assert list(renamed.columns) == ["x", "b"]
+    assert np.shares_memory(renamed["x"].to_numpy(), values)
+
+
+def test_rename_columns_of_arrow_table():
+    table = pa.table({"a": [1], "b": [2]})
+
+    assert rename_columns(table, {"b": "y"}).column_names == ["a", "y"]
+    assert rename_columns(table, {}) is table
+
+
+def test_keys_are_normalized_at_save(workdir):
+    cache = save({"x_1": pd.DataFrame({"a": [1]})})
+
+    assert cache.metadata_store[0]["load_keys"] == {"x_1": "x:1"}
+    assert list(cache.read_data_cache()[0]["data"]) == ["x:1"]
+
+
+def test_cols_mapping_renames_columns_and_keys(workdir):
+    cache = save({"x_1": pd.DataFrame({"a": [1]}), "y_1": pd.DataFrame({"a": [2]})})
+
+    (el,) = cache.read_data_cache(cols_mapping={"a": "b", "y:1": "z_2"})
+
+    assert list(el["data"]) == ["x:1", "z:2"]
+    assert list(el["data"]["x:1"].columns) == ["b"]
+
+
+def test_renamed_read_leaves_memory_tier_copy_intact(workdir, monkeypatch):
+    monkeypatch.setattr(CacheManager, "memory_tier", MemoryCacheTier())
+    cache = save({"k": pd.DataFrame({"a": [1]})})
+
+    renamed = cache.read_data_cache(cols_mapping={"a": "b"})[0]["data"]["k"]
+    plain = cache.read_data_cache()[0]["data"]["k"]
+
+    assert list(renamed.columns) == ["b"]
+    assert list(plain.columns) == ["a"]
+
+
+def test_remote_references_are_not_inherited(workdir):
+    cache = save({"k": pd.DataFrame({"a": [1]}), "r": "s3://bucket/r.parquet"})
+
+    assert cache.read_data_cache()[0]["data"]["r"] == "s3://bucket/r.parquet"
+    assert cache._remote_keys == {"r"}
+
+    cache = save({"k": pd.DataFrame({"a": [1]})})
+    assert cache._remote_keys == set()
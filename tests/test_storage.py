@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+
+import pandas as pd
+import pytest
+
+from new_cache_manager import (
+    CacheManager,
+    FsspecStorage,
+    LocalReadThroughTier,
+    LocalStorage,
+)
+
+
+@pytest.fixture
+def memory_root():
+    root = f"memory://nodecache-{uuid.uuid4().hex}"
+    storage = FsspecStorage(root)
+    yield storage, root
+    with suppress(FileNotFoundError):
+        storage.fs.rm(root, recursive=True)
+
+
+def test_local_storage_roundtrip_and_links(tmp_path):
+    storage = LocalStorage()
+    path, copy = str(tmp_path / "a" / "x.bin"), str(tmp_path / "a" / "y.bin")
+    storage.makedirs(str(tmp_path / "a"))
+    storage.write_bytes(path, b"12345")
+    storage.link(path, copy)
+
+    assert storage.read_bytes(copy) == b"12345"
+    assert os.stat(path).st_ino == os.stat(copy).st_ino
+    assert storage.du(str(tmp_path)) == 5
+    assert not [name for name in os.listdir(tmp_path / "a") if name.endswith(".tmp")]
+
+
+def test_local_lock_is_exclusive(tmp_path):
+    storage, path = LocalStorage(), str(tmp_path / "node" / ".lock")
+    with storage.lock(path, 1.0, 60):
+        with pytest.raises(TimeoutError):
+            with storage.lock(path, 0.1, 60):
+                pass
+    with storage.lock(path, 0.0, 60):
+        pass
+
+
+def test_fsspec_storage_on_memory(memory_root):
+    storage, root = memory_root
+    storage.makedirs(f"{root}/n")
+    storage.write_bytes(f"{root}/n/manifest.json", b"{}")
+    tmp_path = storage.temp_path(f"{root}/n/k.parquet")
+    pd.DataFrame({"a": [1, 2, 3]}).to_parquet(tmp_path)
+    storage.commit(tmp_path, f"{root}/n/k.parquet")
+    storage.link(f"{root}/n/k.parquet", f"{root}/n/k2.parquet")
+
+    assert not os.path.exists(tmp_path)
+    assert storage.read_bytes(f"{root}/n/manifest.json") == b"{}"
+    with storage.open_input(f"{root}/n/k2.parquet") as source:
+        assert pd.read_parquet(source)["a"].tolist() == [1, 2, 3]
+    size = storage.fs.size(f"{root}/n/k.parquet")
+    assert storage.du(f"{root}/n") == 2 * size + 2
+    assert sorted(storage.glob(f"{root}/n/*.parquet")) == sorted(
+        storage.fs.glob(f"{root}/n/k*.parquet")
+    )
+
+
+def test_lease_is_renewed_while_held(memory_root):
+    storage, root = memory_root
+    path, ttl = f"{root}/n/.lock", 0.6
+    with storage.lock(path, 1.0, ttl):
+        time.sleep(2 * ttl)  # без продления lease уже истёк бы
+        with pytest.raises(TimeoutError):
+            with storage.lock(path, 0.3, ttl):
+                pass
+    assert not storage.fs.exists(path)
+    with storage.lock(path, 0.0, ttl):
+        pass
+
+
+def read(tier: LocalReadThroughTier, storage, path: str) -> tuple[str, bytes]:
+    with tier.local_copy(storage, path) as local_path:
+        with open(local_path, "rb") as f:
+            return local_path, f.read()
+
+
+def test_read_through_tier_evicts_least_recently_used(tmp_path, memory_root):
+    storage, root = memory_root
+    for name in "abc":
+        storage.write_bytes(f"{root}/{name}", name.encode() * 100)
+    tier = LocalReadThroughTier(str(tmp_path / "tier"), max_bytes=250)
+
+    a, _ = read(tier, storage, f"{root}/a")
+    b, _ = read(tier, storage, f"{root}/b")
+    assert read(tier, storage, f"{root}/a")[0] == a  # a свежее b
+    c, _ = read(tier, storage, f"{root}/c")
+
+    assert (tier.hits, tier.misses) == (1, 3)
+    assert os.path.isfile(a) and os.path.isfile(c) and not os.path.exists(b)
+    assert tier.nbytes == 200
+
+    storage.write_bytes(f"{root}/a", b"z" * 120)  # новая версия скачивается заново
+    fresh, content = read(tier, storage, f"{root}/a")
+    assert fresh != a and content == b"z" * 120
+    assert tier.nbytes <= 250
+
+
+def test_read_through_tier_keeps_copy_in_use(tmp_path, memory_root):
+    storage, root = memory_root
+    for name in "abcd":
+        storage.write_bytes(f"{root}/{name}", name.encode() * 100)
+    tier = LocalReadThroughTier(str(tmp_path / "tier"), max_bytes=150)
+
+    with tier.local_copy(storage, f"{root}/a") as held:
+        read(tier, storage, f"{root}/b")
+        read(tier, storage, f"{root}/c")
+        with open(held, "rb") as f:
+            assert f.read() == b"a" * 100
+    assert tier.nbytes == 200  # занятая копия пережила вытеснение
+
+    read(tier, storage, f"{root}/d")
+    assert not os.path.exists(held) and tier.nbytes == 100
+
+
+def test_read_through_tier_limit_is_shared_by_instances(tmp_path, memory_root):
+    storage, root = memory_root
+    for name in "abcd":
+        storage.write_bytes(f"{root}/{name}", name.encode() * 100)
+    # два экземпляра с одним root — как два процесса
+    first, second = (
+        LocalReadThroughTier(str(tmp_path / "tier"), max_bytes=250) for _ in range(2)
+    )
+    for tier, name in zip([first, second, first, second], "abcd"):
+        read(tier, storage, f"{root}/{name}")
+        assert LocalStorage().du(str(tmp_path / "tier")) <= 250
+
+
+def test_read_through_tier_concurrent_cold_reads_under_eviction(tmp_path):
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    storage = FsspecStorage(f"file://{remote}")
+    contents = {f"{remote}/f{i}": bytes([i]) * 1000 for i in range(10)}
+    for path, content in contents.items():
+        storage.write_bytes(path, content)
+    tier = LocalReadThroughTier(str(tmp_path / "tier"), max_bytes=3000)
+    paths = sorted(contents)
+
+    def reader(seed: int) -> None:
+        for step in range(30):
+            path = paths[(seed * 7 + step * 3) % len(paths)]
+            assert read(tier, storage, path)[1] == contents[path]
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(reader, range(6)))
+
+    read(tier, storage, paths[0])  # последнее вытеснение без занятых копий
+    assert tier.hits + tier.misses == 6 * 30 + 1
+    assert LocalStorage().du(str(tmp_path / "tier")) <= 3000
+
+
+def test_file_url_root_is_local_path(workdir, tmp_path):
+    cache = CacheManager(f"file://{tmp_path}/store")
+    cache.save_node("n", "p", [{"name": "o", "data": {"k": pd.DataFrame({"a": [1]})}}])
+
+    assert isinstance(cache.storage, LocalStorage)
+    assert cache.path.startswith(f"{tmp_path}/store/")
+    assert not os.path.exists("file:")
+    restored = CacheManager.open("p", "n", storage_root=f"file://{tmp_path}/store")
+    assert restored.read_data_cache()[0]["data"]["k"]["a"].tolist() == [1]
@@ -0,0 +1,64 @@
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import new_cache_manager
+from new_cache_manager import CacheArtifactError, CacheManager
+
+
+def test_hash_is_computed_while_writing(workdir, monkeypatch):
+    hashes = []
+    describe = new_cache_manager.describe_parquet
+
+    def spy(path, content_hash=None):
+        hashes.append(content_hash)
+        return describe(path, content_hash)
+
+    monkeypatch.setattr(new_cache_manager, "describe_parquet", spy)
+    chunks = iter([pd.DataFrame({"b": [1, 2]}), pd.DataFrame({"b": [3]})])
+    data = {"k": pd.DataFrame({"a": range(1000)}), "s": chunks, "e": iter([])}
+    cache = CacheManager()
+    cache.save_node("n", "p", [{"name": "o", "data": data}])
+
+    assert len(hashes) == len(cache.artifacts) == 2
+    assert None not in hashes
+    for info in cache.artifacts.values():
+        content = Path(info["path"]).read_bytes()
+        assert info["hash"] == hashlib.blake2b(content, digest_size=16).hexdigest()
+        assert info["num_bytes"] == len(content)
+
+
+@pytest.mark.parametrize(
+    "options, expected",
+    [({"row_group_size": 10}, 10), ({"write_policy": "preview-optimized"}, 10_000)],
+)
+def test_row_group_size_is_shared_by_frames_and_streams(workdir, options, expected):
+    rows = 2 * expected + 5
+    df = pd.DataFrame({"a": range(rows)})
+    chunks = (df.iloc[i : i + 7] for i in range(0, rows, 7))
+    cache = CacheManager(**options)
+    cache.save_node("n", "p", [{"name": "o", "data": {"frame": df, "stream": chunks}}])
+
+    for info in cache.artifacts.values():
+        meta = pq.read_metadata(info["path"])
+        sizes = [meta.row_group(i).num_rows for i in range(meta.num_row_groups)]
+        assert sizes == [expected, expected, 5]
+
+
+def test_errors_are_keyed_by_element_and_key(workdir):
+    def broken(message):
+        yield pd.DataFrame({"a": [1]})
+        raise RuntimeError(message)
+
+    data = [
+        {"name": "first", "data": {"k": broken("first failed")}},
+        {"name": "second", "data": {"k": broken("second failed")}},
+    ]
+    with pytest.raises(CacheArtifactError) as err:
+        CacheManager(max_workers=2).save_node("n", "p", data)
+
+    errors = {key: str(error) for key, error in err.value.errors.items()}
+    assert errors == {("first", "k"): "first failed", ("second", "k"): "second failed"}
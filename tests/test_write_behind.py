@@ -0,0 +1,46 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from new_cache_manager import CacheArtifactError, CacheManager
+
+
+def broken():
+    yield pd.DataFrame({"a": [1]})
+    raise RuntimeError("source failed")
+
+
+def test_failed_background_write_is_reported_once(workdir):
+    good = [{"name": "o", "data": {"k": pd.DataFrame({"a": [1, 2]})}}]
+
+    async def scenario():
+        cache = CacheManager()
+        cache.save_node("n", "p", good)
+        cache.save_node_behind("n", "p", [{"name": "o", "data": {"k": broken()}}])
+        with pytest.raises(CacheArtifactError):
+            await cache.aread_data_cache()
+        # ошибка уже получена: чтение видит последний успешно записанный снимок
+        (el,) = await cache.aread_data_cache()
+        await cache.aflush()
+        return el["data"]["k"]
+
+    assert asyncio.run(scenario())["a"].tolist() == [1, 2]
+
+
+def test_flush_waits_for_write_started_meanwhile(workdir):
+    async def scenario():
+        cache = CacheManager()
+        first = cache.save_node_behind(
+            "n", "p", [{"name": "o", "data": {"k": broken()}}]
+        )
+        with pytest.raises(CacheArtifactError):
+            await cache.aflush()
+        assert first.done() and cache._pending_save is None
+
+        data = [{"name": "o", "data": {"k": pd.DataFrame({"a": [3]})}}]
+        cache.save_node_behind("n", "p", data)
+        (el,) = await cache.aread_data_cache()
+        return el["data"]["k"]
+
+    assert asyncio.run(scenario())["a"].tolist() == [3]
@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from new_cache_manager import CacheManager, WritePolicy
+
+
+def save(data, **kwargs):
+    cache = CacheManager(**kwargs)
+    cache.save_node("n", "p", [{"name": "o", "data": data}])
+    return cache
+
+
+def column_meta(cache, key):
+    path = cache.artifacts[
+        next(p for p in cache.artifacts if p.endswith(f"/{key}.parquet"))
+    ]
+    return pq.read_metadata(path["path"]).row_group(0).column(0)
+
+
+def test_policy_drives_codec_and_page_index(workdir):
+    cache = save(
+        {"k": pd.DataFrame({"a": range(10)})}, write_policy="preview-optimized"
+    )
+    meta = column_meta(cache, "k")
+
+    assert meta.compression == "SNAPPY"
+    assert meta.has_offset_index and meta.has_column_index
+    assert {info["write_policy"] for info in cache.artifacts.values()} == {
+        "preview-optimized"
+    }
+
+
+def test_key_policy_overrides_node_policy(workdir):
+    custom = WritePolicy(name="custom", compression="zstd", use_dictionary=False)
+    data = {"k": pd.DataFrame({"a": range(10)}), "s": pd.DataFrame({"a": range(10)})}
+    cache = save(data, write_policy="fast-write", key_write_policies={"s": custom})
+
+    assert column_meta(cache, "k").compression == "LZ4"
+    assert column_meta(cache, "s").compression == "ZSTD"
+    policies = {
+        p.rsplit("/", 1)[-1]: i["write_policy"] for p, i in cache.artifacts.items()
+    }
+    assert policies == {"k.parquet": "fast-write", "s.parquet": "custom"}
+
+
+def test_unknown_policy_is_rejected(workdir):
+    with pytest.raises(ValueError, match="Unknown write policy"):
+        CacheManager(write_policy="tiny")
+    with pytest.raises(ValueError, match="Unknown write policy"):
+        CacheManager(key_write_policies={"k": "tiny"})
+
+
+def test_changed_policy_rewrites_unchanged_table(workdir):
+    df = pd.DataFrame({"a": range(10)})
+    (first,) = save({"k": df}).artifacts.values()
+    (same,) = save({"k": df}).artifacts.values()
+    assert os.path.samefile(first["path"], same["path"])
+
+    recoded = save({"k": df}, write_policy="small-on-disk")
+    (info,) = recoded.artifacts.values()
+    assert not os.path.samefile(same["path"], info["path"])
+    assert column_meta(recoded, "k").compression == "ZSTD"